@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from collections import defaultdict
+
+# A segment stops taking appends once it grows past this many bytes
+SEGMENT_BYTES = 64 * 2 ** 20
+
+INDEX_FILE = "index.jsonl"
+
+
+def article_key(article):
+    # 'http://arxiv.org/abs/1905.01234v2' -> ('1905.01234', 2)
+    unique_id = article['id'].rsplit('/abs/', 1)[-1]
+    key, version = unique_id.rsplit('v', 1)
+    return key, int(version)
+
+
+def segment_name(number):
+    return "segment-{:06d}.jsonl".format(number)
+
+
+def segment_number(name):
+    return int(name[len("segment-"):-len(".jsonl")])
+
+
+class ArticleStore:
+    # Articles are appended as JSON lines to numbered segment files and
+    # never rewritten in place. index.jsonl is an append-only log of
+    # [key, version, segment, offset, length] entries; replaying it gives
+    # the newest version of every article and where its line starts.
+    # Superseded lines stay behind until compact() copies the live ones
+    # of mostly dead segments into a new segment.
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.lock = threading.RLock()
+        self.index = {}
+        self.live_bytes = defaultdict(int)
+        self.readers = {}
+        self.compactor = None
+        os.makedirs(root, exist_ok=True)
+
+        recovered = self.load()
+        numbers = [segment_number(name) for name in self.segments()]
+        self.next_number = max(numbers, default=0) + 1
+        self.active = segment_name(max(numbers)) if numbers \
+            else self.new_segment()
+        self.writer = open(self.path(self.active), 'ab')
+        self.index_log = open(self.path(INDEX_FILE), 'a')
+        self.log_entries(recovered)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith("segment-")
+                      and name.endswith(".jsonl"))
+
+    def new_segment(self):
+        name = segment_name(self.next_number)
+        self.next_number += 1
+        return name
+
+    def record(self, key, version, segment, offset, length):
+        # A later entry for the same version is the same article moved by
+        # compaction, so only older versions are ignored
+        current = self.index.get(key)
+        if current is not None:
+            if current[0] > version:
+                return
+            self.live_bytes[current[1]] -= current[3]
+        self.index[key] = (version, segment, offset, length)
+        self.live_bytes[segment] += length
+
+    def load(self):
+        ends = defaultdict(int)
+        if os.path.exists(self.path(INDEX_FILE)):
+            # An entry cut short is dropped too, so the entries logged after
+            # it start on a line of their own
+            with open(self.path(INDEX_FILE), 'rb+') as index_log:
+                position = 0
+                for line in index_log:
+                    if not line.endswith(b'\n'):
+                        index_log.truncate(position)
+                        break
+                    key, version, segment, offset, length = json.loads(line)
+                    self.record(key, version, segment, offset, length)
+                    ends[segment] = max(ends[segment], offset + length)
+                    position += len(line)
+
+        # Lines appended after the index log was last written are indexed
+        # again, and a line cut short by a crash is dropped
+        recovered = []
+        for segment in self.segments():
+            with open(self.path(segment), 'rb+') as data:
+                data.seek(ends[segment])
+                offset = ends[segment]
+                for line in data:
+                    if not line.endswith(b'\n'):
+                        data.truncate(offset)
+                        break
+                    key, version = article_key(json.loads(line))
+                    entry = (key, version, segment, offset, len(line))
+                    self.record(*entry)
+                    recovered.append(entry)
+                    offset += len(line)
+        return recovered
+
+    def log_entries(self, entries):
+        for entry in entries:
+            self.index_log.write(json.dumps(entry) + '\n')
+        self.index_log.flush()
+
+    def put(self, articles):
+        # Appends the articles that are new or newer than the stored
+        # version. Returns (added, updated).
+        added = 0
+        updated = 0
+        entries = []
+        with self.lock:
+            for article in articles:
+                key, version = article_key(article)
+                current = self.index.get(key)
+                if current is not None and current[0] >= version:
+                    continue
+
+                data = (json.dumps(article) + '\n').encode('utf-8')
+                if self.writer.tell() and \
+                        self.writer.tell() + len(data) > self.segment_bytes:
+                    self.writer.close()
+                    self.active = self.new_segment()
+                    self.writer = open(self.path(self.active), 'ab')
+
+                entry = (key, version, self.active, self.writer.tell(),
+                         len(data))
+                self.writer.write(data)
+                self.record(*entry)
+                entries.append(entry)
+                if current is None:
+                    added += 1
+                else:
+                    updated += 1
+
+            # Data reaches the disk before the index entries pointing at it
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+            self.log_entries(entries)
+        return added, updated
+
+    def read(self, segment, offset, length):
+        reader = self.readers.get(segment)
+        if reader is None:
+            reader = self.readers[segment] = open(self.path(segment), 'rb')
+        reader.seek(offset)
+        return reader.read(length)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            if entry[1] == self.active:
+                self.writer.flush()
+            return json.loads(self.read(*entry[1:]))
+
+    def version(self, key):
+        entry = self.index.get(key)
+        return entry[0] if entry else None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        for key in list(self.index):
+            yield self.get(key)
+
+    def compact(self, max_live_ratio=0.5):
+        # Copies the live lines of every sealed segment that is mostly
+        # superseded into one new segment. Appends carry on meanwhile; an
+        # article updated during the copy keeps its newer entry.
+        with self.lock:
+            victims = [segment for segment in self.segments()
+                       if segment != self.active and
+                       self.live_bytes[segment] <=
+                       max_live_ratio * os.path.getsize(self.path(segment))]
+            if not victims:
+                return 0
+            moving = [(key, entry) for key, entry in self.index.items()
+                      if entry[1] in victims]
+            target = self.new_segment()
+
+        moved = []
+        with open(self.path(target), 'wb') as output:
+            for key, entry in moving:
+                with self.lock:
+                    data = self.read(*entry[1:])
+                moved.append((key, entry, output.tell()))
+                output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+
+        with self.lock:
+            for key, entry, offset in moved:
+                if self.index.get(key) == entry:
+                    self.record(key, entry[0], target, offset, entry[3])
+
+            # The rewritten log holds exactly one entry per article
+            self.index_log.close()
+            temp_path = self.path(INDEX_FILE + ".tmp")
+            with open(temp_path, 'w') as index_log:
+                for key, entry in self.index.items():
+                    index_log.write(json.dumps((key,) + entry) + '\n')
+            os.replace(temp_path, self.path(INDEX_FILE))
+            self.index_log = open(self.path(INDEX_FILE), 'a')
+
+            for segment in victims:
+                reader = self.readers.pop(segment, None)
+                if reader is not None:
+                    reader.close()
+                os.remove(self.path(segment))
+                self.live_bytes.pop(segment, None)
+        return len(victims)
+
+    def compact_in_background(self, max_live_ratio=0.5):
+        if self.compactor is None or not self.compactor.is_alive():
+            self.compactor = threading.Thread(target=self.compact,
+                                              args=(max_live_ratio,))
+            self.compactor.start()
+
+    def close(self):
+        if self.compactor is not None:
+            self.compactor.join()
+        with self.lock:
+            self.writer.close()
+            self.index_log.close()
+            for reader in self.readers.values():
+                reader.close()
@@ -185,7 +185,7 @@ def main():
         if check_existence(session, PaperTable, id_string):
             exist_version = session.query(PaperTable.c.version).\
                 filter(PaperTable.c.id == id_string).one()
-            if int(article_df.iloc[0, 1]) > exist_version[0]:
+            if int(row_df.iloc[0, 1]) > exist_version[0]:
                 update_existing_articles(session,
                                          PaperTable, id_string, row_df)
                 count_update += 1
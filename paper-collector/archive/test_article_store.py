@@ -0,0 +1,139 @@
+import json
+import os
+import pytest
+import article_store
+from article_store import ArticleStore, INDEX_FILE
+
+# Small enough that a few articles fill a segment
+SEGMENT_BYTES = 600
+
+
+def article(number, version, text='abstract'):
+    return {'id': f'http://arxiv.org/abs/2005.{number:05d}v{version}',
+            'title': f'Paper {number}', 'summary': f'{text} v{version}'}
+
+
+def segment_files(root):
+    return sorted(name for name in os.listdir(root)
+                  if name.startswith('segment-'))
+
+
+def newest(store, count):
+    return {key: store.get(key)['summary']
+            for key in (f'2005.{number:05d}' for number in range(count))}
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / 'store')
+
+
+def test_reopened_store_serves_the_newest_versions(root):
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert store.put([article(i, 1) for i in range(6)]) == (6, 0)
+    assert store.put([article(2, 2), article(3, 1), article(9, 1)]) == (1, 1)
+    store.close()
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert len(store) == 7
+    assert store.version('2005.00002') == 2
+    assert store.get('2005.00002')['summary'] == 'abstract v2'
+    assert len(segment_files(root)) > 1
+    store.close()
+
+
+def test_partial_trailing_line_is_truncated(root):
+    store = ArticleStore(root, SEGMENT_BYTES)
+    store.put([article(0, 1), article(1, 1)])
+    active = store.active
+    store.close()
+
+    path = os.path.join(root, active)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as segment:
+        segment.write(b'{"id": "http://arxiv.org/abs/2005.00002v1", "ti')
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert os.path.getsize(path) == size
+    assert len(store) == 2
+    assert store.put([article(2, 1)]) == (1, 0)
+    assert store.get('2005.00002')['title'] == 'Paper 2'
+    store.close()
+
+
+def test_lines_past_the_index_log_are_indexed_again(root):
+    store = ArticleStore(root, SEGMENT_BYTES)
+    store.put([article(0, 1)])
+    active = store.active
+    store.close()
+
+    # A crash after the data reached the segment but before its index
+    # entries did, and one in the middle of an index line
+    with open(os.path.join(root, active), 'ab') as segment:
+        segment.write((json.dumps(article(1, 1)) + '\n').encode('utf-8'))
+        segment.write((json.dumps(article(0, 2)) + '\n').encode('utf-8'))
+    with open(os.path.join(root, INDEX_FILE), 'a') as index_log:
+        index_log.write('["2005.0')
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert newest(store, 2) == {'2005.00000': 'abstract v2',
+                                '2005.00001': 'abstract v1'}
+    store.close()
+
+    # The recovered entries were logged, so a second open agrees
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert newest(store, 2) == {'2005.00000': 'abstract v2',
+                                '2005.00001': 'abstract v1'}
+    store.close()
+
+
+def test_compaction_drops_superseded_segments(root):
+    store = ArticleStore(root, SEGMENT_BYTES)
+    store.put([article(i, 1) for i in range(8)])
+    store.put([article(i, 2) for i in range(8)])
+    sizes = {name: os.path.getsize(os.path.join(root, name))
+             for name in segment_files(root)}
+
+    victims = store.compact()
+    assert victims > 0
+    after = segment_files(root)
+    assert not set(sorted(sizes)[:victims]) & set(after)
+    assert sum(os.path.getsize(os.path.join(root, name))
+               for name in after) < sum(sizes.values())
+    assert newest(store, 8) == {f'2005.{i:05d}': 'abstract v2'
+                                for i in range(8)}
+    store.close()
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert newest(store, 8) == {f'2005.{i:05d}': 'abstract v2'
+                                for i in range(8)}
+    store.close()
+
+
+def test_crash_before_old_segments_are_removed(root, monkeypatch):
+    store = ArticleStore(root, SEGMENT_BYTES)
+    store.put([article(i, 1) for i in range(8)])
+    store.put([article(i, 2) for i in range(8)])
+
+    # The rewritten index log is in place, the victims are still on disk
+    def crash(path):
+        raise OSError('crash')
+    monkeypatch.setattr(article_store.os, 'remove', crash)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.undo()
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    expected = {f'2005.{i:05d}': 'abstract v2' for i in range(8)}
+    assert newest(store, 8) == expected
+    assert store.put([article(8, 1)]) == (1, 0)
+
+    # The leftovers hold no live articles and go with the next compaction
+    store.compact()
+    assert newest(store, 8) == expected
+    store.close()
+
+    store = ArticleStore(root, SEGMENT_BYTES)
+    assert newest(store, 8) == expected
+    assert len(store) == 9
+    store.close()
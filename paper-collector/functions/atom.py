@@ -0,0 +1,67 @@
+import io
+import xml.etree.ElementTree as ET
+from records import PaperRow, UNIQUE_ID, VERSION, parse_timestamp
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+ARXIV = '{http://arxiv.org/schemas/atom}'
+
+ENTRY = ATOM + 'entry'
+
+
+def text(element, tag):
+    value = element.findtext(tag)
+    return value.strip() if value is not None else None
+
+
+def entry_row(entry):
+    arxiv_id = entry.findtext(ATOM + 'id') or ''
+    unique_id = UNIQUE_ID.search(arxiv_id)
+    version = VERSION.search(arxiv_id)
+    if unique_id is None or version is None:
+        return None
+
+    authors = [author.findtext(ATOM + 'name')
+               for author in entry.iterfind(ATOM + 'author')]
+
+    # feedparser, behind the arxiv client, sets author to the last <author>
+    # it sees. The pandas and slim paths store that, so this one does too.
+
+    return PaperRow(
+        unique_id.group(1),
+        int(version.group(1)),
+        authors[-1] if authors else None,
+        text(entry, ATOM + 'title'),
+        text(entry, ATOM + 'summary'),
+        text(entry, ARXIV + 'comment'),
+        {'term': [category.get('term')
+                  for category in entry.iterfind(ATOM + 'category')]},
+        parse_timestamp(entry.findtext(ATOM + 'published')),
+        parse_timestamp(entry.findtext(ATOM + 'updated')),
+        authors)
+
+
+def iter_rows(source):
+    # One row per <entry>, or None where the id is not a paper id (the API
+    # reports errors as entries). Finished entries are dropped from the
+    # tree, so memory does not grow with the page.
+    root = None
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag == ENTRY:
+            yield entry_row(element)
+            root.clear()
+
+
+def parse_page(data):
+    # Returns the number of entries in the page and its distinct rows
+    count = 0
+    rows = []
+    seen = set()
+    for row in iter_rows(io.BytesIO(data)):
+        count += 1
+        if row is None or row.id in seen:
+            continue
+        seen.add(row.id)
+        rows.append(row)
+    return count, rows
@@ -0,0 +1,44 @@
+import hashlib
+from sqlalchemy import select, func
+from tables import AuthorDimTable, PaperAuthorTable
+
+author_dim_table = AuthorDimTable.__table__
+paper_author_table = PaperAuthorTable.__table__
+
+
+def normalize_name(name):
+    return ' '.join(name.split()).lower()
+
+
+def author_key(name):
+    # Matches ('x' || substr(md5(normalized), 1, 16))::bit(64)::bigint,
+    # which the migration uses to backfill existing rows
+    digest = hashlib.md5(normalize_name(name).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def papers_by_author(connection, name):
+    stmt = select([paper_author_table.c.paper_id]).where(
+        paper_author_table.c.author_id == author_key(name))
+
+    return [row.paper_id for row in connection.execute(stmt)]
+
+
+def coauthors(connection, name):
+    # Every other author on any of this author's papers, with a count of
+    # shared papers
+    key = author_key(name)
+    own = paper_author_table.alias('own')
+    other = paper_author_table.alias('other')
+    shared = select([other.c.author_id]).select_from(
+        own.join(other, own.c.paper_id == other.c.paper_id)).where(
+        own.c.author_id == key).where(other.c.author_id != key).alias()
+
+    stmt = select([author_dim_table.c.name,
+                   func.count().label('papers')]).select_from(
+        shared.join(author_dim_table,
+                    shared.c.author_id == author_dim_table.c.id)).group_by(
+        author_dim_table.c.id, author_dim_table.c.name).order_by(
+        func.count().desc())
+
+    return connection.execute(stmt).fetchall()
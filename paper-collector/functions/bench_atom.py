@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+from atom import parse_page
+from records import paper_rows
+
+# Hand-written pages in the API's response format, covering affiliations,
+# multi-line fields, duplicate and old-style ids and an error entry
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'atom', '*.xml')
+
+FIELDS = ['id', 'version', 'author', 'title', 'summary', 'arxiv_comment',
+          'tags', 'published_datetime', 'updated_datetime', 'authors']
+
+
+def feedparser_rows(data):
+    # What the arxiv client hands over: feedparser entries with the
+    # author list flattened to names
+    import feedparser
+    entries = []
+    for entry in feedparser.parse(data)['entries']:
+        entry = dict(entry)
+        entry['authors'] = [author['name']
+                            for author in entry.get('authors', [])]
+        entries.append(entry)
+    return paper_rows(entries)
+
+
+def normalized(row):
+    # feedparser and ElementTree disagree only on inner whitespace
+    values = []
+    for field in FIELDS:
+        value = row[field]
+        values.append(' '.join(value.split())
+                      if isinstance(value, str) else value)
+    return values
+
+
+def read_feeds(pattern):
+    feeds = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'rb') as f:
+            feeds.append((path, f.read()))
+    return feeds
+
+
+def verify(feeds):
+    mismatches = 0
+    for path, data in feeds:
+        native = parse_page(data)[1]
+        reference = feedparser_rows(data)
+        if len(native) != len(reference):
+            print(f"{path}: {len(native)} rows, feedparser "
+                  f"{len(reference)}")
+            mismatches += 1
+            continue
+        for ours, theirs in zip(native, reference):
+            if normalized(ours) != normalized(theirs):
+                print(f"{path}: {ours.id} differs")
+                mismatches += 1
+    return mismatches
+
+
+def measure(parse, feeds):
+    entries = sum(len(parse_page(data)[1]) for _, data in feeds)
+
+    start = time.process_time()
+    for _, data in feeds:
+        parse(data)
+    cpu = time.process_time() - start
+
+    tracemalloc.start()
+    for _, data in feeds:
+        parse(data)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return cpu / entries * 1000, allocated / 1024 ** 2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Check atom.py against feedparser on saved feeds and '
+                    'compare parse cost per 1,000 entries.')
+    parser.add_argument('feeds', nargs='?',
+                        help='glob of saved Atom responses; a synthetic '
+                             'feed from fake_arxiv.py is used otherwise')
+    parser.add_argument('--papers', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.feeds:
+        feeds = read_feeds(args.feeds)
+    else:
+        import fake_arxiv
+        from urllib.request import urlopen
+        server = fake_arxiv.serve(fake_arxiv.synthetic_corpus(args.papers),
+                                  max_page=args.papers)
+        with urlopen(f"{server.url}query?max_results={args.papers}") as r:
+            feeds = [('synthetic', r.read())]
+
+    # The fixtures are always checked along with the measured feeds
+    mismatches = verify(read_feeds(FIXTURES) + feeds)
+    print(f"{mismatches} mismatching entries against feedparser")
+
+    for name, parse in [('atom.py', parse_page),
+                        ('feedparser', feedparser_rows)]:
+        cpu, peak = measure(parse, feeds)
+        print(f"{name:<12}{cpu:8.3f}s CPU per 1,000 entries, "
+              f"peak allocations {peak:7.1f} MB")
+
+    sys.exit(1 if mismatches else 0)
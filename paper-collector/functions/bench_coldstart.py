@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PATHS = ['pandas', 'slim', 'native']
+
+
+def run_single(path, page_file):
+    with open(page_file, 'rb') as f:
+        data = f.read()
+
+    # Everything from here on is what a cold instance pays for
+    start = time.perf_counter()
+    import main
+    import fetch
+    imported = time.perf_counter()
+    count, records = fetch.page_records(data)
+    transformed = time.perf_counter()
+
+    return {'path': path,
+            'records': len(records),
+            'import_seconds': imported - start,
+            'transform_seconds': transformed - imported,
+            'peak_rss_mb': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'pandas_loaded': 'pandas' in sys.modules}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare cold start time and peak memory of the '
+                    'pandas, slim and native ingest paths.')
+    parser.add_argument('--papers', type=int, default=1000)
+    parser.add_argument('--single', help=argparse.SUPPRESS)
+    parser.add_argument('--page', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.page)))
+        sys.exit()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    import fake_arxiv
+    from urllib.request import urlopen
+    from bench_transform import synthetic_articles
+
+    # The arxiv client paths read entry JSON, the native path raw Atom
+    server = fake_arxiv.serve(fake_arxiv.synthetic_corpus(args.papers),
+                              max_page=args.papers)
+    with urlopen(f"{server.url}query?max_results={args.papers}") as r:
+        pages = {'native': r.read()}
+    pages['pandas'] = pages['slim'] = json.dumps(
+        synthetic_articles(args.papers)).encode('utf-8')
+
+    print(f"{'path':<8}{'import':>10}{'transform':>12}{'peak RSS':>12}")
+    for path in PATHS:
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(pages[path])
+        try:
+            env = dict(os.environ, INGEST_PATH=path)
+            output = subprocess.run(
+                [sys.executable, __file__, '--single', path,
+                 '--page', f.name],
+                check=True, stdout=subprocess.PIPE, env=env).stdout
+        finally:
+            os.remove(f.name)
+        result = json.loads(output.decode().strip().splitlines()[-1])
+        print(f"{path:<8}{result['import_seconds']:>9.3f}s"
+              f"{result['transform_seconds']:>11.3f}s"
+              f"{result['peak_rss_mb']:>9.1f} MB")
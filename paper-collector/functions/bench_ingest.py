@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+SIZES = [1000, 10000, 100000]
+
+
+def timed(stage, func, timings):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[stage] += time.perf_counter() - start
+    return wrapper
+
+
+def run_single(n, latency, page_size):
+    import fake_arxiv
+    server = fake_arxiv.serve(fake_arxiv.synthetic_corpus(n), latency=latency)
+
+    # Constants are read at import, so configure before loading the pipeline
+    os.environ.update({'ARXIV_API_URL': server.url, 'FETCH_DELAY': '0',
+                       'START': '0', 'MAX': str(n),
+                       'PAGE_SIZE': str(page_size)})
+
+    from sqlalchemy import event
+    import fetch
+    import main
+
+    with main.engine.begin() as connection:
+        # Also the tables CASCADE cannot reach from PaperTable
+        connection.execute('TRUNCATE "AuthorTable", "PaperTable", '
+                           'ingest_state, lsh_bands, paper_versions, '
+                           'citations, features, authors CASCADE')
+
+    round_trips = [0]
+
+    @event.listens_for(main.engine, 'before_cursor_execute')
+    def count_round_trip(*args):
+        round_trips[0] += 1
+
+    timings = defaultdict(float)
+    fetch.fetch_page = timed('fetch', fetch.fetch_page, timings)
+    fetch.page_records = timed('transform', fetch.page_records, timings)
+    main.classify_batch = timed('diff', main.classify_batch, timings)
+    write = timed('write', main.upsert_articles, timings)
+
+    start = time.perf_counter()
+    count_insert, count_update = main.ingest([main.search_query], 0,
+                                             incremental=False, write=write)
+    elapsed = time.perf_counter() - start
+
+    return {'papers': n,
+            'inserted': count_insert,
+            'seconds': elapsed,
+            'records_per_sec': count_insert / elapsed,
+            'db_round_trips': round_trips[0],
+            'http_requests': server.stats['requests'],
+            'peak_rss_mb': resource.getrusage(
+                resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'stages': dict(timings)}
+
+
+def report(result):
+    print(f"{result['papers']:>7} papers: {result['seconds']:8.2f}s, "
+          f"{result['records_per_sec']:8.0f} records/s, "
+          f"{result['db_round_trips']:6d} DB round trips, "
+          f"{result['http_requests']:4d} HTTP requests, "
+          f"peak RSS {result['peak_rss_mb']:7.1f} MB")
+    for stage, seconds in sorted(result['stages'].items()):
+        print(f"{'':>16}{stage:<16}{seconds:8.2f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='End-to-end ingest benchmark against fake_arxiv.py. '
+                    'Empties every collected table: PaperTable, '
+                    'AuthorTable, ingest_state, authors, citations, '
+                    'features, lsh_bands and paper_versions, and the '
+                    'tables that reference PaperTable.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--reset', action='store_true',
+                        help='confirm the SQL_* database is a scratch copy')
+    parser.add_argument('--single', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.latency,
+                                    args.page_size)))
+        sys.exit()
+
+    if not args.reset:
+        sys.exit('Refusing to run without --reset: the benchmark empties '
+                 'the tables of the configured database.')
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # One process per size so peak RSS is not carried over between runs
+    for n in args.sizes:
+        output = subprocess.run(
+            [sys.executable, __file__, '--single', str(n),
+             '--latency', str(args.latency),
+             '--page-size', str(args.page_size)],
+            check=True, stdout=subprocess.PIPE, env=os.environ).stdout
+        report(json.loads(output.decode().strip().splitlines()[-1]))
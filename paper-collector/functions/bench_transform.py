@@ -0,0 +1,60 @@
+import random
+import time
+import pandas as pd
+from transform import extract_column, article_records
+
+SIZES = [1000, 5000, 10000, 25000, 50000]
+CATEGORIES = ['cs.LG', 'stat.ML', 'cs.AI', 'cs.CV', 'cs.NE', 'cs.CL']
+
+
+def synthetic_articles(n):
+    articles = []
+    for i in range(n):
+        authors = [f"Author {random.randint(0, 5 * n)}"
+                   for _ in range(random.randint(1, 8))]
+        tags = [{'term': term, 'scheme': 'http://arxiv.org/schemas/atom',
+                 'label': None}
+                for term in random.sample(CATEGORIES, random.randint(1, 3))]
+        articles.append({
+            'title': f"Synthetic paper {i}",
+            'author': authors[0],
+            'authors': authors,
+            'id': f"http://arxiv.org/abs/{1900 + i // 100000}."
+                  f"{i % 100000:05d}v{random.randint(1, 4)}",
+            'arxiv_comment': "10 pages" if i % 3 else None,
+            'arxiv_primary_category': {'term': tags[0]['term']},
+            'published': f"2019-0{1 + i % 9}-1{i % 10}T12:00:00Z",
+            'summary': "word " * 150,
+            'tags': tags,
+            'updated': f"2019-0{1 + i % 9}-1{i % 10}T18:30:00Z"})
+    return articles
+
+
+def run(n):
+    articles_df = pd.DataFrame.from_dict(synthetic_articles(n)).reindex(
+        columns=['title', 'author', 'authors', 'id', 'arxiv_comment',
+                 'arxiv_primary_category', 'published', 'summary',
+                 'tags', 'updated'])
+
+    start = time.perf_counter()
+    records = article_records(extract_column(articles_df))
+    elapsed = time.perf_counter() - start
+
+    assert len(records) == n
+    return elapsed
+
+
+if __name__ == '__main__':
+    random.seed(0)
+    run(SIZES[0])  # warm up imports and caches
+
+    per_record = []
+    for n in SIZES:
+        elapsed = run(n)
+        per_record.append(elapsed / n)
+        print(f"{n:>6} records: {elapsed:8.3f}s "
+              f"({elapsed / n * 1e6:6.1f} us/record)")
+
+    # Linear scaling keeps the per-record cost flat as the fetch grows
+    print(f"Per-record cost ratio {SIZES[-1]} vs {SIZES[0]}: "
+          f"{per_record[-1] / per_record[0]:.2f}x")
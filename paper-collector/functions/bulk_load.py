@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+from sqlalchemy import inspect, text, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from constants import *
+from upsert import paper_table, author_table, PAPER_COLUMNS, \
+    delete_for_papers, write_author_links, write_categories
+from search import refresh_search_vectors
+
+AUTHOR_COLUMNS = ['id', 'author', 'paper_id']
+
+# Unquoted \N is NULL, so empty strings still load as empty strings
+NULL = '\\N'
+
+
+def csv_value(value):
+    if value is None:
+        return NULL
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(connection, table_name, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([csv_value(value) for value in row])
+    buffer.seek(0)
+
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(f"COPY {table_name} ({column_list}) FROM STDIN "
+                       f"WITH (FORMAT csv, NULL '{NULL}')", buffer)
+    cursor.close()
+
+
+def copy_articles(connection, records):
+    if not records:
+        return 0, 0
+
+    # Staging tables vanish with the transaction that loaded them
+    connection.execute(f'CREATE TEMP TABLE paper_stage '
+                       f'(LIKE "{paper_table.name}") ON COMMIT DROP')
+    connection.execute(f'CREATE TEMP TABLE author_stage '
+                       f'(LIKE "{author_table.name}") ON COMMIT DROP')
+
+    copy_rows(connection, 'paper_stage', PAPER_COLUMNS,
+              ([record[column] for column in PAPER_COLUMNS]
+               for record in records))
+    copy_rows(connection, 'author_stage', AUTHOR_COLUMNS,
+              ((record['id'] + "-" + str(i), name, record['id'])
+               for record in records
+               for i, name in enumerate(record['authors'])))
+
+    columns = ', '.join(f'"{column}"' for column in PAPER_COLUMNS)
+    updates = ', '.join(f'"{column}" = excluded."{column}"'
+                        for column in PAPER_COLUMNS[1:])
+    newer = '>=' if REWRITE else '>'
+    written = connection.execute(
+        f'INSERT INTO "{paper_table.name}" ({columns}) '
+        f'SELECT {columns} FROM paper_stage '
+        f'ON CONFLICT (id) DO UPDATE SET {updates} '
+        f'WHERE excluded.version {newer} "{paper_table.name}".version '
+        f'RETURNING id, (xmax = 0) AS inserted').fetchall()
+
+    written_ids = {row.id for row in written}
+    changed = [record for record in records if record['id'] in written_ids]
+
+    # Drop positions a new version no longer has before merging the rest
+    delete_for_papers(connection, author_table, changed)
+    merge_authors = text(
+        f'INSERT INTO "{author_table.name}" (id, author, paper_id) '
+        f'SELECT id, author, paper_id FROM author_stage '
+        f'WHERE paper_id = ANY(:ids) '
+        f'ON CONFLICT (id) DO UPDATE SET author = excluded.author, '
+        f'paper_id = excluded.paper_id').bindparams(
+            bindparam('ids', type_=ARRAY(String)))
+    connection.execute(merge_authors, ids=list(written_ids))
+    write_author_links(connection, changed)
+    write_categories(connection, changed)
+    refresh_search_vectors(connection, written_ids)
+
+    inserted = sum(1 for row in written if row.inserted)
+    return inserted, len(written) - inserted
+
+
+def drop_indexes(connection):
+    # Secondary indexes are rebuilt once after a seed instead of being
+    # maintained row by row during it
+    for table in (paper_table, author_table):
+        for index in table.indexes:
+            connection.execute(f'DROP INDEX IF EXISTS "{index.name}"')
+
+
+def create_indexes(connection):
+    inspector = inspect(connection)
+    for table in (paper_table, author_table):
+        existing = {index['name']
+                    for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
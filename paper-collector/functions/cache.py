@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import os
+import threading
+
+
+class PageCache:
+    # Compressed raw API pages on local disk. Files are named by a hash of
+    # what was requested, and the least recently read go first once the
+    # cache grows past max_bytes.
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.size = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(search_query, start, page_size, kind):
+        request = f"{kind}\n{search_query}\n{start}\n{page_size}"
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + '.gz')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with gzip.open(path, 'rb') as cached:
+                data = cached.read()
+        except FileNotFoundError:
+            return None
+
+        # Access time is often disabled, so recency lives in the mtime
+        os.utime(path)
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so readers never see a partial page
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, 'wb') as cached:
+            cached.write(data)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self.entries())
+            else:
+                self.size += os.path.getsize(path)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.gz'):
+                    path = os.path.join(directory, name)
+                    stat = os.stat(path)
+                    yield stat.st_mtime, stat.st_size, path
+
+    def evict(self):
+        entries = sorted(self.entries())
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.size <= self.max_bytes:
+                break
+            os.remove(path)
+            self.size -= size
@@ -0,0 +1,23 @@
+from sqlalchemy import select
+from tables import PaperTable, PaperCategoryTable
+
+paper_table = PaperTable.__table__
+paper_category_table = PaperCategoryTable.__table__
+
+LISTED_COLUMNS = ['id', 'version', 'title', 'author', 'updated_datetime']
+
+
+def latest_in_category(connection, category, since=None, limit=50):
+    # Walks ix_paper_categories_category_updated backwards from the newest
+    # update and joins only the rows it returns
+    joined = paper_category_table.join(
+        paper_table, paper_category_table.c.paper_id == paper_table.c.id)
+    stmt = select([paper_table.c[column] for column in LISTED_COLUMNS]) \
+        .select_from(joined) \
+        .where(paper_category_table.c.category == category) \
+        .order_by(paper_category_table.c.updated_datetime.desc()) \
+        .limit(limit)
+    if since is not None:
+        stmt = stmt.where(paper_category_table.c.updated_datetime >= since)
+
+    return [dict(row) for row in connection.execute(stmt)]
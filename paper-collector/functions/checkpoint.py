@@ -0,0 +1,57 @@
+from datetime import datetime
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from tables import PaperTable, IngestStateTable
+
+paper_table = PaperTable.__table__
+state_table = IngestStateTable.__table__
+
+RUNNING = 'running'
+DONE = 'done'
+
+
+def load_state(connection, search_query):
+    stmt = select([state_table]).where(
+        state_table.c.search_query == search_query)
+
+    return connection.execute(stmt).first()
+
+
+def save_state(connection, search_query, watermark, high_watermark,
+               page_offset, status):
+    values = {'watermark': watermark,
+              'high_watermark': high_watermark,
+              'page_offset': page_offset,
+              'status': status,
+              'updated_at': datetime.utcnow()}
+    stmt = insert(state_table).values(search_query=search_query, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[state_table.c.search_query], set_=values)
+    connection.execute(stmt)
+
+
+def resume_point(connection, search_query, start, incremental=True):
+    # Returns (watermark, start offset, high watermark) for the next run,
+    # picking up an interrupted run where its last batch committed
+    state = load_state(connection, search_query)
+    if state is not None and state.status == RUNNING:
+        return state.watermark, state.page_offset, state.high_watermark
+
+    if not incremental:
+        return None, start, None
+
+    if state is not None:
+        watermark = state.high_watermark
+    else:
+        watermark = connection.execute(
+            select([func.max(paper_table.c.updated_datetime)])).scalar()
+
+    return watermark, start, watermark
+
+
+def latest_update(records, high_watermark):
+    for record in records:
+        if high_watermark is None or \
+                record['updated_datetime'] > high_watermark:
+            high_watermark = record['updated_datetime']
+    return high_watermark
@@ -0,0 +1,224 @@
+import argparse
+import io
+import re
+import time
+from sqlalchemy import text, bindparam, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from constants import *
+from tables import engine, PaperTable, CitationTable, FeatureTable
+from upsert import chunked
+from bulk_load import copy_rows
+from read import iter_papers
+
+paper_table = PaperTable.__table__
+citation_table = CitationTable.__table__
+feature_table = FeatureTable.__table__
+
+# Edge sources. Dump edges are authoritative; metadata edges belong to the
+# version of the citing paper they were read from and are replaced with it.
+DUMP = 'dump'
+METADATA = 'metadata'
+
+# New-style arXiv ids (YYMM.NNNNN) mentioned in free text, version dropped
+ARXIV_ID = re.compile(r'(?<![\d.])(\d\d(?:0[1-9]|1[0-2])\.\d{4,5})'
+                      r'(?:v\d+)?(?!\.?\d)')
+
+FEATURE_COLUMNS = ['id', 'num_cite', 'num_cited_by']
+
+# Degrees of the given ids, counted over both citations indexes
+REFRESH_FEATURES = text(f"""
+    INSERT INTO "{feature_table.name}" (id, num_cite, num_cited_by)
+    SELECT node,
+           (SELECT count(*) FROM "{citation_table.name}"
+            WHERE citing_id = node),
+           (SELECT count(*) FROM "{citation_table.name}"
+            WHERE cited_id = node)
+    FROM unnest(:ids) AS node
+    ON CONFLICT (id) DO UPDATE SET num_cite = excluded.num_cite,
+                                   num_cited_by = excluded.num_cited_by
+    """).bindparams(bindparam('ids', type_=ARRAY(String)))
+
+
+class CitationGraph:
+    # Compressed sparse rows over nodes numbered in sorted id order. Edges
+    # are packed into int64 codes, citing node in the high 32 bits and
+    # cited node in the low 32, then sorted and deduplicated, so the
+    # references of node i are indices[indptr[i]:indptr[i + 1]].
+    def __init__(self, citing, cited, nodes=()):
+        # Only rebuilds load numpy; ingest's record_citations never does
+        import numpy as np
+        self.np = np
+
+        citing = np.asarray(citing, dtype=str)
+        cited = np.asarray(cited, dtype=str)
+        self.nodes, inverse = np.unique(
+            np.concatenate([citing, cited, np.asarray(nodes, dtype=str)]),
+            return_inverse=True)
+
+        src = inverse[:len(citing)].astype(np.int64)
+        dst = inverse[len(citing):len(citing) + len(cited)]
+        codes = np.unique((src << 32) | dst)
+
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes >> 32, minlength=len(self.nodes)),
+                  out=self.indptr[1:])
+        self.indices = (codes & 0xFFFFFFFF).astype(np.int32)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        return self.np.diff(self.indptr)
+
+    def in_degree(self):
+        return self.np.bincount(self.indices, minlength=len(self.nodes))
+
+    def references(self, id):
+        i = self.np.searchsorted(self.nodes, id)
+        if i == len(self.nodes) or self.nodes[i] != id:
+            return []
+        return self.nodes[self.indices[self.indptr[i]:self.indptr[i + 1]]] \
+            .tolist()
+
+
+def normalize_id(value):
+    match = ARXIV_ID.search(value)
+    return match.group(1) if match else value.strip()
+
+
+def extract_edges(records):
+    # Ids a paper mentions in its abstract or comment, other than its own
+    edges = []
+    for record in records:
+        text_fields = ' '.join(record[field] or ''
+                               for field in ('summary', 'arxiv_comment'))
+        for cited in dict.fromkeys(ARXIV_ID.findall(text_fields)):
+            if cited != record['id']:
+                edges.append((record['id'], cited))
+    return edges
+
+
+def read_edge_list(path):
+    # One "citing cited" pair per line, whitespace or comma separated
+    with open(path) as lines:
+        for line in lines:
+            line = line.split('#', 1)[0].replace(',', ' ').split()
+            if len(line) >= 2:
+                yield normalize_id(line[0]), normalize_id(line[1])
+
+
+def stage_edges(connection, edges, source):
+    connection.execute(f'CREATE TEMP TABLE citation_stage '
+                       f'(LIKE "{citation_table.name}") ON COMMIT DROP')
+    copy_rows(connection, 'citation_stage', ['citing_id', 'cited_id',
+                                             'source'],
+              ((citing, cited, source) for citing, cited in edges
+               if citing != cited))
+
+
+def import_edges(connection, edges):
+    stage_edges(connection, edges, DUMP)
+    connection.execute(
+        f'INSERT INTO "{citation_table.name}" '
+        f'SELECT DISTINCT citing_id, cited_id, source FROM citation_stage '
+        f'ON CONFLICT (citing_id, cited_id) DO UPDATE SET source = '
+        f'excluded.source')
+
+
+def import_metadata_edges(connection):
+    # Re-reads every stored abstract and comment, for papers written
+    # before citations were recorded on ingest
+    papers = iter_papers(engine, ['id', 'summary', 'arxiv_comment'],
+                         page_size=EXPORT_PAGE_SIZE)
+    stage_edges(connection, extract_edges(papers), METADATA)
+    connection.execute(text(f'DELETE FROM "{citation_table.name}" '
+                            f'WHERE source = :source'), source=METADATA)
+    connection.execute(
+        f'INSERT INTO "{citation_table.name}" '
+        f'SELECT DISTINCT citing_id, cited_id, source FROM citation_stage '
+        f'ON CONFLICT (citing_id, cited_id) DO NOTHING')
+
+
+def copy_out(connection, table_name, columns):
+    # COPY out is far cheaper than materializing a million result rows
+    buffer = io.StringIO()
+    column_list = ', '.join(columns)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(f'COPY "{table_name}" ({column_list}) TO STDOUT',
+                       buffer)
+    cursor.close()
+    return [line.split('\t') for line in buffer.getvalue().splitlines()]
+
+
+def load_graph(connection):
+    edges = copy_out(connection, citation_table.name,
+                     ['citing_id', 'cited_id'])
+    papers = copy_out(connection, paper_table.name, ['id'])
+    return CitationGraph([edge[0] for edge in edges],
+                         [edge[1] for edge in edges],
+                         [paper[0] for paper in papers])
+
+
+def write_features(connection, graph):
+    # Every row is derived from the graph, so the table is replaced whole
+    connection.execute(f'DELETE FROM "{feature_table.name}"')
+    copy_rows(connection, f'"{feature_table.name}"', FEATURE_COLUMNS,
+              zip(graph.nodes.tolist(), graph.out_degree().tolist(),
+                  graph.in_degree().tolist()))
+
+
+def refresh_features(connection, ids):
+    if ids:
+        connection.execute(REFRESH_FEATURES, ids=sorted(ids))
+
+
+def record_citations(connection, records, batch_size=UPSERT_BATCH):
+    # Called by ingest for each written batch. Only the batch's papers and
+    # the ids they cite, now or in their previous version, change degree.
+    if not records:
+        return
+
+    stmt = text(f'DELETE FROM "{citation_table.name}" '
+                f'WHERE citing_id = ANY(:ids) AND source = :source '
+                f'RETURNING cited_id').bindparams(
+                    bindparam('ids', type_=ARRAY(String)))
+    dropped = connection.execute(stmt, ids=[record['id']
+                                            for record in records],
+                                 source=METADATA).fetchall()
+
+    edges = extract_edges(records)
+    for batch in chunked(edges, batch_size):
+        stmt = insert(citation_table).values(
+            [{'citing_id': citing, 'cited_id': cited, 'source': METADATA}
+             for citing, cited in batch])
+        connection.execute(stmt.on_conflict_do_nothing())
+
+    affected = {record['id'] for record in records}
+    affected.update(row.cited_id for row in dropped)
+    affected.update(cited for citing, cited in edges)
+    refresh_features(connection, affected)
+
+
+def rebuild_features(connection, dump=None, metadata=False):
+    if metadata:
+        import_metadata_edges(connection)
+    if dump:
+        import_edges(connection, read_edge_list(dump))
+    graph = load_graph(connection)
+    write_features(connection, graph)
+    return graph
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Recompute the features table from the citation graph.')
+    parser.add_argument('--dump', help='edge list to import first')
+    parser.add_argument('--metadata', action='store_true',
+                        help='re-extract edges from stored papers first')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        graph = rebuild_features(connection, args.dump, args.metadata)
+    print(f"{len(graph.nodes)} papers, {len(graph)} citations in "
+          f"{time.perf_counter() - start:.2f}s")
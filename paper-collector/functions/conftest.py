@@ -0,0 +1,7 @@
+import os
+
+# constants.py requires these; tests never open a database connection
+for name, value in [('SQL_USER', 'test'), ('SQL_PWD', 'test'),
+                    ('SQL_HOST', 'localhost'), ('SQL_DB', 'test'),
+                    ('START', '0'), ('MAX', '1000')]:
+    os.environ.setdefault(name, value)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 SQL_USER = os.environ.get('SQL_USER')
@@ -8,9 +9,90 @@ SQL_DB = os.environ.get('SQL_DB')
 
 START_INDEX = int(os.environ.get('START'))
 FETCH_MAX = int(os.environ.get('MAX'))
-FETCH_ADDITIONAL = 200
+
+# Results requested per arXiv API call, and the pause between calls that
+# the arXiv API terms ask for
+PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 200))
+FETCH_DELAY = float(os.environ.get('FETCH_DELAY', 3))
+
+# Base URL of the arXiv API, overridable to point at fake_arxiv.py
+ARXIV_API_URL = os.environ.get('ARXIV_API_URL',
+                               'http://export.arxiv.org/api/')
+
+# Seconds before a single API request is abandoned
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', 60))
+
+# Shard queries fetched concurrently, all sharing the one rate limit above
+FETCH_SHARDS = int(os.environ.get('FETCH_SHARDS', 4))
+
+# Local cache of raw API pages, off unless CACHE_DIR is set. With REPLAY
+# on, pages are only read back from the cache and nothing is fetched.
+CACHE_DIR = os.environ.get('CACHE_DIR')
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 2 ** 30))
+REPLAY = os.environ.get('REPLAY', '').lower() in ('1', 'true')
+
+# Writes papers again even when the stored version is the same, so a replay
+# re-runs a changed or fixed transform over an already populated database
+REWRITE = os.environ.get('REWRITE', '').lower() in ('1', 'true')
+
+# How initiate_database writes: 'copy' streams each batch through COPY into
+# staging tables, 'upsert' uses the same INSERT ... ON CONFLICT path as
+# update_database. DEFER_INDEXES drops secondary indexes for the load.
+BULK_LOAD = os.environ.get('BULK_LOAD', 'copy')
+DEFER_INDEXES = os.environ.get('DEFER_INDEXES', '').lower() in ('1', 'true')
+
+# Record pipeline: 'pandas' builds DataFrames through transform.py, 'slim'
+# builds compact rows through records.py without importing pandas, and
+# 'native' downloads the raw Atom feed and parses rows with atom.py,
+# skipping the arxiv client and feedparser as well
+INGEST_PATH = os.environ.get('INGEST_PATH', 'pandas')
+
+# Full-text search backend: 'postgres' ranks over the GIN-indexed
+# search_vector, 'sqlite' uses an FTS5 file for running without Postgres.
+# ingest indexes every written paper into the file.
+SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'postgres')
+SEARCH_SQLITE_PATH = os.environ.get(
+    'SEARCH_SQLITE_PATH', os.path.join(tempfile.gettempdir(),
+                                       'paper_search.sqlite3'))
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# In-process cache in front of the query entry points: entry bound and
+# per-query time to live in seconds
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 1024))
+SEARCH_CACHE_TTL = 300
+LATEST_CACHE_TTL = 60
+AUTHOR_CACHE_TTL = 600
+
+# Related-papers index of memory-mapped vector segments, off unless
+# SIMILARITY_DIR is set. Appends past SIMILARITY_MAX_SEGMENTS are merged.
+SIMILARITY_DIR = os.environ.get('SIMILARITY_DIR')
+SIMILARITY_MAX_SEGMENTS = int(os.environ.get('SIMILARITY_MAX_SEGMENTS', 8))
+SIMILAR_CACHE_TTL = 600
+
+# Estimated Jaccard similarity of title and summary shingles at which two
+# papers are linked as near-duplicates
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0.8))
+DUPLICATE_CACHE_TTL = 600
+
+HISTORY_CACHE_TTL = 600
+
+# Rows fetched per keyset page while streaming an export
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', 1000))
+
+# Parquet snapshot of papers and authors, one file per published month,
+# off unless PARQUET_DIR is set. Months a run writes to are rewritten.
+PARQUET_DIR = os.environ.get('PARQUET_DIR')
+
+# Connection pool kept by each warm Cloud Function instance
+POOL_SIZE = int(os.environ.get('POOL_SIZE', 2))
+POOL_OVERFLOW = int(os.environ.get('POOL_OVERFLOW', 2))
+POOL_RECYCLE = 1800
+
+# Number of papers written per multi-row INSERT ... ON CONFLICT statement
+UPSERT_BATCH = int(os.environ.get('UPSERT_BATCH', 500))
 
 assert SQL_USER, 'SQL_USER is required.'
 assert SQL_PWD, 'SQL_PWD is required.'
 assert SQL_HOST, 'SQL_HOST is required.'
-assert SQL_DB, 'SQL_DB is required.'
+assert SQL_DB, 'SQL_DB is required.'
\ No newline at end of file
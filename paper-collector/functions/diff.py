@@ -0,0 +1,33 @@
+from sqlalchemy import select, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from constants import *
+from tables import PaperTable
+
+paper_table = PaperTable.__table__
+
+
+def existing_versions(connection, ids):
+    stmt = select([paper_table.c.id, paper_table.c.version]).where(
+        paper_table.c.id == any_(bindparam('ids', type_=ARRAY(String))))
+
+    return dict(connection.execute(stmt, ids=list(ids)).fetchall())
+
+
+def classify_batch(connection, records):
+    # One round trip decides insert / update / skip for the whole batch.
+    # With REWRITE on, papers at their stored version count as updates.
+    versions = existing_versions(connection,
+                                 [record['id'] for record in records])
+
+    new, newer, unchanged = [], [], []
+    for record in records:
+        exist_version = versions.get(record['id'])
+        if exist_version is None:
+            new.append(record)
+        elif record['version'] > exist_version or \
+                (REWRITE and record['version'] == exist_version):
+            newer.append(record)
+        else:
+            unchanged.append(record)
+
+    return new, newer, unchanged
@@ -0,0 +1,246 @@
+import argparse
+import re
+import time
+import zlib
+import numpy as np
+from sqlalchemy import select, delete, or_, any_, text, bindparam, String, \
+    SmallInteger, BigInteger
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from constants import *
+from tables import engine, PaperSignatureTable, LshBandTable, \
+    PaperDuplicateTable
+from upsert import chunked, delete_for_papers
+from bulk_load import copy_rows
+from read import iter_papers
+
+signature_table = PaperSignatureTable.__table__
+band_table = LshBandTable.__table__
+duplicate_table = PaperDuplicateTable.__table__
+
+# 16 bands of 8 rows put the 50% candidate point near a Jaccard similarity
+# of 0.7, below the threshold candidates are then checked against
+PERMUTATIONS = 128
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+
+# Shingles are runs of SHINGLE consecutive words, hashed by mixing the
+# crc32 of each word instead of joining and hashing strings. Words are
+# split on UTF-8 bytes, so accented letters break a word, consistently.
+SHINGLE = 3
+TOKEN = re.compile(rb'\w+')
+
+# Buckets this crowded hold boilerplate such as withdrawal notices, and
+# pairing their members would make the bulk pass quadratic
+BUCKET_LIMIT = 100
+
+# Fixed seed, since stored signatures only compare under the same hashes
+_random = np.random.RandomState(2020)
+MULTIPLIERS = _random.randint(0, 2 ** 64, PERMUTATIONS, dtype=np.uint64) \
+    | np.uint64(1)
+OFFSETS = _random.randint(0, 2 ** 64, PERMUTATIONS, dtype=np.uint64)
+BAND_MIX = _random.randint(0, 2 ** 64, ROWS, dtype=np.uint64) | np.uint64(1)
+SHINGLE_MIX = _random.randint(0, 2 ** 64, SHINGLE, dtype=np.uint64) \
+    | np.uint64(1)
+SHIFT = np.uint64(32)
+
+CANDIDATES = text(f"""
+    SELECT DISTINCT batch.paper_id, other.paper_id AS other_id
+    FROM unnest(:bands, :buckets, :ids) AS batch(band, bucket, paper_id)
+    JOIN "{band_table.name}" other
+      ON other.band = batch.band AND other.bucket = batch.bucket
+    WHERE other.paper_id <> batch.paper_id""").bindparams(
+        bindparam('bands', type_=ARRAY(SmallInteger)),
+        bindparam('buckets', type_=ARRAY(BigInteger)),
+        bindparam('ids', type_=ARRAY(String)))
+
+
+def shingles(record):
+    text = f"{record['title']} {record['summary'] or ''}".lower()
+    words = np.fromiter(map(zlib.crc32, TOKEN.findall(text.encode('utf-8'))),
+                        dtype=np.uint64)
+    if len(words) < SHINGLE:
+        return np.unique(words)
+    count = len(words) - SHINGLE + 1
+    mixed = sum((words[i:i + count] * SHINGLE_MIX[i]
+                 for i in range(SHINGLE)), np.uint64(0))
+    return np.unique(mixed >> SHIFT)
+
+
+def signature(hashes):
+    # Multiply-shift hashing; products wrap at 2 ** 64 by design
+    values = (hashes[:, None] * MULTIPLIERS + OFFSETS) >> SHIFT
+    return values.min(axis=0).astype(np.uint32)
+
+
+def signatures(records):
+    # Records without any words get no signature and are never matched
+    ids = []
+    rows = []
+    for record in records:
+        hashes = shingles(record)
+        if len(hashes):
+            ids.append(record['id'])
+            rows.append(signature(hashes))
+    return ids, np.array(rows, dtype=np.uint32).reshape(-1, PERMUTATIONS)
+
+
+def band_buckets(signatures):
+    mixed = signatures.astype(np.uint64).reshape(-1, BANDS, ROWS) * BAND_MIX
+    return mixed.sum(axis=2, dtype=np.uint64).view(np.int64)
+
+
+def similarity(first, second):
+    # Share of agreeing permutations, an estimate of Jaccard similarity
+    return (first == second).mean(axis=-1)
+
+
+def from_bytes(data):
+    return np.frombuffer(data, dtype='<u4')
+
+
+def delete_links(connection, ids):
+    ids_param = bindparam('ids', type_=ARRAY(String))
+    connection.execute(delete(duplicate_table).where(or_(
+        duplicate_table.c.paper_id == any_(ids_param),
+        duplicate_table.c.duplicate_id == any_(ids_param))), ids=ids)
+
+
+def link_duplicates(connection, records, batch_size=UPSERT_BATCH):
+    # Called by ingest for each written batch. A new version is hashed
+    # from scratch and its old bands and links are dropped first.
+    if not records:
+        return 0
+
+    delete_for_papers(connection, band_table, records)
+    delete_for_papers(connection, signature_table, records)
+    delete_links(connection, [record['id'] for record in records])
+
+    ids, batch_signatures = signatures(records)
+    if not ids:
+        return 0
+    buckets = band_buckets(batch_signatures)
+
+    for batch in chunked(list(zip(ids, batch_signatures)), batch_size):
+        connection.execute(insert(signature_table).values(
+            [{'paper_id': id, 'signature': row.astype('<u4').tobytes()}
+             for id, row in batch]))
+    band_rows = [{'band': band, 'bucket': int(bucket), 'paper_id': id}
+                 for id, row in zip(ids, buckets)
+                 for band, bucket in enumerate(row)]
+    for batch in chunked(band_rows, batch_size * BANDS):
+        connection.execute(insert(band_table).values(batch))
+
+    # Bands are in place before the lookup, so duplicates within the batch
+    # find each other too
+    candidates = connection.execute(
+        CANDIDATES, bands=[row['band'] for row in band_rows],
+        buckets=[row['bucket'] for row in band_rows],
+        ids=[row['paper_id'] for row in band_rows]).fetchall()
+    if not candidates:
+        return 0
+
+    known = dict(zip(ids, batch_signatures))
+    others = {row.other_id for row in candidates} - set(known)
+    if others:
+        stored = connection.execute(
+            select([signature_table.c.paper_id, signature_table.c.signature])
+            .where(signature_table.c.paper_id == any_(
+                bindparam('others', type_=ARRAY(String)))),
+            others=list(others))
+        known.update((row.paper_id, from_bytes(row.signature))
+                     for row in stored)
+
+    # lsh_bands has no foreign key, so bands can outlive the signature of
+    # a deleted paper; such candidates are skipped
+    pairs = {(min(row.paper_id, row.other_id),
+              max(row.paper_id, row.other_id)) for row in candidates
+             if row.other_id in known}
+    links = [{'paper_id': id, 'duplicate_id': other, 'similarity': score}
+             for id, other, score in
+             ((id, other, float(similarity(known[id], known[other])))
+              for id, other in pairs)
+             if score >= DUPLICATE_THRESHOLD]
+
+    for batch in chunked(links, batch_size):
+        stmt = insert(duplicate_table).values(batch)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[duplicate_table.c.paper_id,
+                            duplicate_table.c.duplicate_id],
+            set_={'similarity': stmt.excluded.similarity}))
+    return len(links)
+
+
+def candidate_pairs(buckets):
+    # Sorts each band's buckets and pairs up the members of every run of
+    # equal keys, so the work grows with the corpus, not its square
+    pairs = []
+    for band in range(BANDS):
+        order = np.argsort(buckets[:, band], kind='stable')
+        keys = buckets[order, band]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            if size > BUCKET_LIMIT:
+                continue
+            members = np.sort(order[start:start + size])
+            first, second = np.triu_indices(size, 1)
+            pairs.append(members[first] * len(buckets) + members[second])
+
+    if not pairs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    codes = np.unique(np.concatenate(pairs))
+    return codes // len(buckets), codes % len(buckets)
+
+
+def rebuild_duplicates(connection, records):
+    # One-off pass over the corpus: signatures for every paper, candidate
+    # pairs from sorted bands in memory, and COPY for all three tables
+    ids, corpus_signatures = signatures(records)
+    buckets = band_buckets(corpus_signatures)
+
+    for table in (duplicate_table, band_table, signature_table):
+        connection.execute(delete(table))
+    copy_rows(connection, signature_table.name, ['paper_id', 'signature'],
+              ((id, '\\x' + row.astype('<u4').tobytes().hex())
+               for id, row in zip(ids, corpus_signatures)))
+    copy_rows(connection, band_table.name, ['band', 'bucket', 'paper_id'],
+              ((band, bucket, id)
+               for id, row in zip(ids, buckets.tolist())
+               for band, bucket in enumerate(row)))
+
+    first, second = candidate_pairs(buckets)
+    scores = similarity(corpus_signatures[first], corpus_signatures[second])
+    keep = scores >= DUPLICATE_THRESHOLD
+    copy_rows(connection, duplicate_table.name,
+              ['paper_id', 'duplicate_id', 'similarity'],
+              ((min(ids[i], ids[j]), max(ids[i], ids[j]), score)
+               for i, j, score in zip(first[keep].tolist(),
+                                      second[keep].tolist(),
+                                      scores[keep].tolist())))
+    return len(ids), int(keep.sum())
+
+
+def duplicates_of(connection, id):
+    forward = select([duplicate_table.c.duplicate_id.label('id'),
+                      duplicate_table.c.similarity]).where(
+        duplicate_table.c.paper_id == id)
+    backward = select([duplicate_table.c.paper_id.label('id'),
+                       duplicate_table.c.similarity]).where(
+        duplicate_table.c.duplicate_id == id)
+    stmt = forward.union_all(backward).order_by(text('similarity DESC'))
+
+    return [dict(row) for row in connection.execute(stmt)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Recompute near-duplicate links over PaperTable.')
+    parser.parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        papers, links = rebuild_duplicates(
+            connection, iter_papers(engine, ['id', 'title', 'summary'],
+                                    page_size=EXPORT_PAGE_SIZE))
+    print(f"{papers} papers, {links} duplicate pairs in "
+          f"{time.perf_counter() - start:.2f}s")
@@ -0,0 +1,135 @@
+import argparse
+import glob
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+ATOM = 'http://www.w3.org/2005/Atom'
+ARXIV = 'http://arxiv.org/schemas/atom'
+OPENSEARCH = 'http://a9.com/-/spec/opensearch/1.1/'
+
+CATEGORIES = ['cs.LG', 'stat.ML', 'cs.AI', 'cs.CV', 'cs.NE', 'cs.CL']
+WORDS = ('deep learning neural network gradient training model data '
+         'reinforcement policy convolution attention graph kernel sparse '
+         'representation generative adversarial optimization robust').split()
+
+FEED_HEAD = f'''<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="{ATOM}" xmlns:opensearch="{OPENSEARCH}" xmlns:arxiv="{ARXIV}">
+  <title type="html">ArXiv Query</title>
+  <id>http://arxiv.org/api/stand-in</id>
+  <updated>{{updated}}</updated>
+  <opensearch:totalResults>{{total}}</opensearch:totalResults>
+  <opensearch:startIndex>{{start}}</opensearch:startIndex>
+  <opensearch:itemsPerPage>{{count}}</opensearch:itemsPerPage>
+'''
+
+
+def synthetic_entry(i, updated, rng):
+    arxiv_id = f"{1900 + i // 100000}.{i % 100000:05d}v{rng.randint(1, 4)}"
+    published = updated - timedelta(days=rng.randint(0, 30))
+    tags = rng.sample(CATEGORIES, rng.randint(1, 3))
+    authors = ''.join(
+        f'<author><name>Author {rng.randint(0, 50000)}</name></author>'
+        for _ in range(rng.randint(1, 8)))
+    categories = ''.join(
+        f'<category term="{tag}" scheme="{ARXIV}"/>' for tag in tags)
+    comment = f'<arxiv:comment>{rng.randint(4, 30)} pages</arxiv:comment>' \
+        if i % 3 else ''
+
+    return (f'<entry><id>http://arxiv.org/abs/{arxiv_id}</id>'
+            f'<updated>{updated:%Y-%m-%dT%H:%M:%SZ}</updated>'
+            f'<published>{published:%Y-%m-%dT%H:%M:%SZ}</published>'
+            f'<title>{" ".join(rng.choices(WORDS, k=8))}</title>'
+            f'<summary>{" ".join(rng.choices(WORDS, k=150))}</summary>'
+            f'{authors}{comment}'
+            f'<link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" '
+            f'type="text/html"/>'
+            f'<link title="pdf" href="http://arxiv.org/pdf/{arxiv_id}" '
+            f'rel="related" type="application/pdf"/>'
+            f'<arxiv:primary_category term="{tags[0]}" scheme="{ARXIV}"/>'
+            f'{categories}</entry>')
+
+
+def synthetic_corpus(n, seed=0):
+    # Newest first, one minute apart, the way lastUpdatedDate sorts
+    rng = random.Random(seed)
+    newest = datetime(2019, 6, 1)
+    return [synthetic_entry(i, newest - timedelta(minutes=i), rng)
+            for i in range(n)]
+
+
+def recorded_corpus(pattern):
+    # Entries from saved API responses, in file then document order
+    ET.register_namespace('', ATOM)
+    ET.register_namespace('arxiv', ARXIV)
+    corpus = []
+    for path in sorted(glob.glob(pattern)):
+        for entry in ET.parse(path).getroot().iter(f'{{{ATOM}}}entry'):
+            corpus.append(ET.tostring(entry, encoding='unicode'))
+    return corpus
+
+
+def make_handler(corpus, latency, max_page, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            args = parse_qs(urlparse(self.path).query)
+            start = int(args.get('start', ['0'])[0])
+            count = min(int(args.get('max_results', ['10'])[0]), max_page)
+            entries = corpus[start:start + count]
+
+            body = (FEED_HEAD.format(
+                updated=f'{datetime.utcnow():%Y-%m-%dT%H:%M:%SZ}',
+                total=len(corpus), start=start, count=len(entries)) +
+                '\n'.join(entries) + '\n</feed>\n').encode('utf-8')
+
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/atom+xml')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+            with stats['lock']:
+                stats['requests'] += 1
+                stats['bytes'] += len(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(corpus, port=0, latency=0.0, max_page=2000):
+    stats = {'requests': 0, 'bytes': 0, 'lock': threading.Lock()}
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', port), make_handler(corpus, latency, max_page, stats))
+    server.daemon_threads = True
+    server.stats = stats
+    server.url = f'http://127.0.0.1:{server.server_address[1]}/api/'
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve synthetic or recorded arXiv Atom feeds locally.')
+    parser.add_argument('--papers', type=int, default=10000)
+    parser.add_argument('--recorded', help='glob of saved Atom responses')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every response')
+    parser.add_argument('--max-page', type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = recorded_corpus(args.recorded) if args.recorded \
+        else synthetic_corpus(args.papers)
+    server = serve(corpus, args.port, args.latency, args.max_page)
+    print(f"Serving {len(corpus)} entries at {server.url}")
+    threading.Event().wait()
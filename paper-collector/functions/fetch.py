@@ -0,0 +1,220 @@
+import json
+import os
+import time
+import queue
+import threading
+from urllib.parse import quote
+from constants import *
+from cache import PageCache
+from transport import Transport
+
+ARTICLE_COLUMNS = ['title', 'author', 'authors', 'id', 'arxiv_comment',
+                   'arxiv_primary_category', 'published', 'summary',
+                   'tags', 'updated']
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens +
+                                  (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every fetching thread so shards never exceed arXiv's spacing.
+# A zero delay, as used against fake_arxiv.py, disables it.
+limiter = TokenBucket(1 / FETCH_DELAY) if FETCH_DELAY > 0 else None
+
+page_cache = PageCache(CACHE_DIR, CACHE_MAX_BYTES) if CACHE_DIR else None
+
+# Validators live next to the page cache when there is one, and otherwise
+# only for as long as the warm instance does
+transport = Transport(FETCH_TIMEOUT,
+                      os.path.join(CACHE_DIR, 'validators.json')
+                      if CACHE_DIR else None)
+
+
+def download_entries(search_query, start, page_size):
+    # Imported on first use to keep it off the cold start path
+    import arxiv
+    arxiv.arxiv.root_url = ARXIV_API_URL
+
+    if limiter is not None:
+        limiter.acquire()
+    new_articles = arxiv.query(search_query, max_results=page_size,
+                               start=start,
+                               sort_by="lastUpdatedDate",
+                               sort_order="descending")
+
+    # Only the fields we read are kept, which also drops the parsed
+    # time structs that do not serialize
+    return json.dumps([{column: article.get(column)
+                        for column in ARTICLE_COLUMNS}
+                       for article in new_articles]).encode('utf-8')
+
+
+def feed_url(search_query, start, page_size):
+    # The query strings above are already partly percent-encoded
+    return (f"{ARXIV_API_URL}query?search_query="
+            f"{quote(search_query, safe='%:')}&start={start}"
+            f"&max_results={page_size}"
+            f"&sortBy=lastUpdatedDate&sortOrder=descending")
+
+
+def download_feed(search_query, start, page_size, conditional=False):
+    if limiter is not None:
+        limiter.acquire()
+    return transport.get(feed_url(search_query, start, page_size),
+                         conditional)
+
+
+def fetch_page(search_query, start, page_size, conditional=False):
+    # None means there is nothing (new) to read at this offset
+    native = INGEST_PATH == 'native'
+    key = PageCache.key(search_query, start, page_size,
+                        'atom' if native else 'entries')
+
+    if REPLAY:
+        # Replays never touch the network and end where the cache runs out
+        return page_cache.get(key) if page_cache is not None else None
+
+    if native:
+        data = download_feed(search_query, start, page_size, conditional)
+    else:
+        data = download_entries(search_query, start, page_size)
+    if data is not None and page_cache is not None:
+        page_cache.put(key, data)
+    return data
+
+
+def page_records(data):
+    # Returns the number of entries in the page and its distinct records
+    if data is None:
+        return 0, []
+
+    if INGEST_PATH == 'native':
+        from atom import parse_page
+        return parse_page(data)
+
+    entries = json.loads(data)
+    if INGEST_PATH == 'slim':
+        from records import paper_rows
+        return len(entries), paper_rows(entries)
+
+    # pandas dominates cold start time, so only the pandas path loads it
+    import pandas as pd
+    from transform import extract_column, article_records
+
+    page_df = pd.DataFrame.from_dict(entries).reindex(
+        columns=ARTICLE_COLUMNS)
+    return len(entries), article_records(extract_column(page_df))
+
+
+def iter_pages(search_query, watermark=None, start=START_INDEX,
+               page_size=PAGE_SIZE, max_results=FETCH_MAX):
+    # Pages arrive newest first, so the first record at or below the
+    # watermark means everything after it has already been collected.
+    # Yields (offset, records, complete). complete stays False when an
+    # incremental run stops at max_results before reaching its watermark,
+    # so the run can carry on from offset next time.
+    offset = start
+    end = start + max_results
+    while offset < end:
+        size = min(page_size, end - offset)
+        # An unchanged first page of an incremental run ends it right away.
+        # A run resumed further down has no first page to compare.
+        conditional = watermark is not None and offset == START_INDEX
+        count, records = page_records(
+            fetch_page(search_query, offset, size, conditional))
+        if not count:
+            yield offset, [], True
+            return
+        offset += count
+
+        fresh = records if watermark is None else \
+            [record for record in records
+             if record['updated_datetime'] >= watermark]
+
+        complete = count < size or len(fresh) < len(records)
+        yield offset, fresh, complete or \
+            (watermark is None and offset >= end)
+
+        if complete:
+            return
+
+
+def fetch_sharded(shards, workers=FETCH_SHARDS):
+    # shards maps each query to its (watermark, start offset). Pages are
+    # yielded as (query, offset, records, complete) in whatever order they
+    # land.
+    pages = queue.Queue(maxsize=2 * workers)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Gives up once the consumer has stopped, rather than blocking on a
+        # full queue for the life of the warm instance
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(query, watermark, start):
+        try:
+            for page in iter_pages(query, watermark, start=start):
+                if not put((query,) + page):
+                    return
+            put((query, done, None, None))
+        except Exception as error:
+            put((query, done, error, None))
+
+    pending = list(shards.items())
+    running = 0
+    try:
+        while pending or running:
+            while pending and running < workers:
+                query, (watermark, start) = pending.pop(0)
+                threading.Thread(target=run,
+                                 args=(query, watermark, start),
+                                 daemon=True).start()
+                running += 1
+
+            query, offset, records, complete = pages.get()
+            if offset is done:
+                running -= 1
+                if records is not None:
+                    raise records
+                continue
+            yield query, offset, records, complete
+    finally:
+        # Reached when every shard is done, one fails or the consumer closes
+        # the generator; workers still fetching stop after their page
+        stop.set()
+
+
+def merge_latest(records, seen):
+    # Keeps only records newer than any version of the same paper already
+    # taken from another shard during this run
+    merged = []
+    for record in records:
+        if record['version'] > seen.get(record['id'], 0):
+            seen[record['id']] = record['version']
+            merged.append(record)
+    return merged
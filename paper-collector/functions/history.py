@@ -0,0 +1,209 @@
+import difflib
+import json
+import re
+import zlib
+from sqlalchemy import select, text, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from constants import *
+from tables import engine, PaperTable, PaperVersionTable
+from upsert import chunked
+
+paper_table = PaperTable.__table__
+version_table = PaperVersionTable.__table__
+
+# A keyframe at least every KEYFRAME_INTERVAL versions bounds the number of
+# deltas replayed to rebuild any one summary
+KEYFRAME_INTERVAL = 8
+
+# Whitespace is kept as its own token so rebuilt summaries are exact
+WHITESPACE = re.compile(r'(\s+)')
+
+# Preset zlib dictionary for keyframes. A single abstract is too short to
+# compress well alone but shares most of this vocabulary. Keyframes only
+# decompress with the dictionary they were written with, so never edit it.
+SUMMARY_DICTIONARY = ' '.join("""
+    we propose a novel method for the problem of in this paper we show
+    that our approach outperforms state-of-the-art methods on benchmark
+    datasets experimental results demonstrate the effectiveness of the
+    proposed deep neural network networks learning model models training
+    data performance based on with and to is are by from which can be
+    this these as an its our reinforcement convolutional graph image
+    images classification detection segmentation generative adversarial
+    representation representations optimization gradient algorithm
+    algorithms framework task tasks features large-scale efficient
+    robust accuracy inference language attention transformer prediction
+    unsupervised supervised semi-supervised learn learned existing
+    however furthermore significantly improves code is available at
+    """.split()).encode('utf-8')
+
+HEADS = select([version_table.c.paper_id, version_table.c.version,
+                version_table.c.chain]) \
+    .where(version_table.c.paper_id == any_(bindparam('ids',
+                                                      type_=ARRAY(String)))) \
+    .order_by(version_table.c.paper_id, version_table.c.version.desc()) \
+    .distinct(version_table.c.paper_id)
+
+STATS = text(f"""
+    SELECT count(*) AS versions,
+           count(*) FILTER (WHERE base_version IS NULL) AS keyframes,
+           coalesce(sum(length(summary_data)), 0) AS stored_bytes,
+           coalesce(sum(summary_length), 0) AS full_bytes
+    FROM "{version_table.name}"
+    """)
+
+
+def tokens(summary):
+    return WHITESPACE.split(summary or '')
+
+
+def compress_keyframe(summary):
+    compressor = zlib.compressobj(9, zdict=SUMMARY_DICTIONARY)
+    return compressor.compress(summary.encode('utf-8')) + compressor.flush()
+
+
+def decompress_keyframe(data):
+    decompressor = zlib.decompressobj(zdict=SUMMARY_DICTIONARY)
+    return (decompressor.decompress(data) + decompressor.flush()) \
+        .decode('utf-8')
+
+
+def make_delta(base, summary):
+    # Runs kept from the base become [start, end) token ranges into it,
+    # anything else is carried as literal text
+    base_tokens = tokens(base)
+    new_tokens = tokens(summary)
+    matcher = difflib.SequenceMatcher(None, base_tokens, new_tokens,
+                                      autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_tokens[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(',', ':'))
+                         .encode('utf-8'), 9)
+
+
+def apply_delta(base, data):
+    base_tokens = tokens(base)
+    return ''.join(''.join(base_tokens[op[0]:op[1]])
+                   if isinstance(op, list) else op
+                   for op in json.loads(zlib.decompress(data)))
+
+
+def version_row(paper, base=None):
+    # base is (version, summary, chain) of the version this one follows.
+    # A delta is only kept while it is smaller than a keyframe would be.
+    summary = paper['summary'] or ''
+    row = {'paper_id': paper['id'],
+           'version': paper['version'],
+           'title': paper['title'],
+           'arxiv_comment': paper['arxiv_comment'],
+           'updated_datetime': paper['updated_datetime'],
+           'base_version': None,
+           'chain': 0,
+           'summary_data': compress_keyframe(summary),
+           'summary_length': len(summary.encode('utf-8'))}
+
+    if base is not None and base[2] < KEYFRAME_INTERVAL:
+        delta = make_delta(base[1], summary)
+        if len(delta) < len(row['summary_data']):
+            row.update(base_version=base[0], chain=base[2],
+                       summary_data=delta)
+    return row
+
+
+def record_versions(connection, records, batch_size=UPSERT_BATCH):
+    # Called by ingest before a batch is written, while PaperTable still
+    # holds the version each record replaces
+    if not records:
+        return
+
+    ids = [record['id'] for record in records]
+    previous = {row.id: row for row in connection.execute(
+        select([paper_table.c.id, paper_table.c.version,
+                paper_table.c.title, paper_table.c.summary,
+                paper_table.c.arxiv_comment, paper_table.c.updated_datetime])
+        .where(paper_table.c.id == any_(bindparam('ids',
+                                                  type_=ARRAY(String)))),
+        ids=ids)}
+    heads = {row.paper_id: row
+             for row in connection.execute(HEADS, ids=ids)}
+
+    rows = []
+    for record in records:
+        stored = previous.get(record['id'])
+        base = None
+        if stored is not None:
+            if stored.version >= record['version']:
+                continue
+            head = heads.get(record['id'])
+            if head is not None and head.version == stored.version:
+                chain = head.chain
+            else:
+                # The stored version predates history; keep it before it
+                # is overwritten
+                rows.append(version_row(stored))
+                chain = 0
+            base = (stored.version, stored.summary, chain + 1)
+        rows.append(version_row(record, base))
+
+    for batch in chunked(rows, batch_size):
+        stmt = insert(version_table).values(batch)
+        connection.execute(stmt.on_conflict_do_nothing(
+            index_elements=[version_table.c.paper_id,
+                            version_table.c.version]))
+
+
+def rebuild_summaries(rows):
+    # rows in version order, starting at a keyframe
+    summaries = {}
+    for row in rows:
+        if row.base_version is None:
+            summaries[row.version] = decompress_keyframe(row.summary_data)
+        else:
+            summaries[row.version] = apply_delta(
+                summaries[row.base_version], row.summary_data)
+    return summaries
+
+
+def summary_at(connection, paper_id, version):
+    # Reads back only as far as the keyframe the version's chain starts at
+    rows = connection.execute(
+        select([version_table.c.version, version_table.c.base_version,
+                version_table.c.chain, version_table.c.summary_data])
+        .where(version_table.c.paper_id == paper_id)
+        .where(version_table.c.version <= version)
+        .order_by(version_table.c.version.desc())
+        .limit(KEYFRAME_INTERVAL)).fetchall()
+    if not rows or rows[0].version != version:
+        return None
+    return rebuild_summaries(reversed(rows[:rows[0].chain + 1]))[version]
+
+
+def history_of(connection, paper_id):
+    rows = connection.execute(
+        select([version_table]).where(version_table.c.paper_id == paper_id)
+        .order_by(version_table.c.version)).fetchall()
+    summaries = rebuild_summaries(rows)
+
+    return [{'version': row.version,
+             'title': row.title,
+             'arxiv_comment': row.arxiv_comment,
+             'updated_datetime': row.updated_datetime,
+             'summary': summaries[row.version]} for row in rows]
+
+
+def storage_stats(connection):
+    stats = dict(connection.execute(STATS).fetchone())
+    stats['ratio'] = stats['stored_bytes'] / stats['full_bytes'] \
+        if stats['full_bytes'] else None
+    return stats
+
+
+if __name__ == '__main__':
+    with engine.connect() as connection:
+        stats = storage_stats(connection)
+    print(f"{stats['versions']} versions ({stats['keyframes']} keyframes): "
+          f"{stats['stored_bytes']} bytes stored for {stats['full_bytes']} "
+          f"bytes of full summaries")
@@ -1,218 +1,339 @@
-from sqlalchemy import create_engine, MetaData, Table, update, func
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
-from sqlalchemy import inspect
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.automap import automap_base
-from sqlalchemy.engine.url import URL
-from constants import *
-
-import os
-import arxiv
-import pandas as pd
+import json
+from contextlib import closing
 from datetime import datetime
-from tables import PaperTable, AuthorTable, engine
+from constants import *
+from tables import engine, create_tables
+from upsert import upsert_articles
+from bulk_load import copy_articles, drop_indexes, create_indexes
+from diff import classify_batch
+from fetch import fetch_sharded, merge_latest, transport
+from search import PostgresSearchEngine, SqliteSearchEngine
+from categories import latest_in_category
+from read import iter_papers, to_ndjson, EXPORT_COLUMNS
+from authors import author_key, papers_by_author, coauthors
+from query_cache import QueryCache
+from citations import record_citations
+from snapshot import ParquetSnapshot
+from history import record_versions, history_of
+from subscriptions import load_subscriptions, save_subscription, \
+    ensure_subscription, union_query, shard_queries, SubscriptionMatcher, \
+    tag_subscriptions, papers_for_subscription
+from checkpoint import resume_point, save_state, latest_update, \
+    RUNNING, DONE
 
 keyword = '%28%22deep learning%22 OR %22neural network%22 \
             OR %22GPU%22 OR %22graphics processing unit%22 \
             OR %22reinforcement learning%22 OR %22perceptron%22%29'
 
-category = '%28cat:cs.LG OR cat:stat.ML OR cat:cs.AI OR cat:cs.CV%29'
+categories = ['cs.LG', 'stat.ML', 'cs.AI', 'cs.CV']
+
+category = '%28' + ' OR '.join('cat:' + item for item in categories) + '%29'
 
 search_query = keyword + " AND " + category
 
+# The collector's own topic, added as the first subscription. Other topics
+# are fetched in the same pass by adding subscriptions next to it.
+default_subscription = ('deep-learning',
+                        ['deep learning', 'neural network', 'GPU',
+                         'graphics processing unit', 'reinforcement learning',
+                         'perceptron'],
+                        categories)
 
-def obtain_new_articles():
-    new_articles = arxiv.query(search_query, max_results=FETCH_MAX,
-                               start=START_INDEX,
-                               sort_by="lastUpdatedDate",
-                               sort_order="descending")
-    new_articles_df = pd.DataFrame.from_dict(new_articles)
-    ordered_new_articles = new_articles_df.reindex(
-        columns=['title', 'author', 'authors', 'id', 'arxiv_comment',
-                 'arxiv_primary_category', 'published', 'summary',
-                 'tags', 'updated'])
-
-    return ordered_new_articles
+search_engine = SqliteSearchEngine(SEARCH_SQLITE_PATH) \
+    if SEARCH_ENGINE == 'sqlite' else PostgresSearchEngine(engine)
 
+similarity_index = None
+if SIMILARITY_DIR:
+    # numpy and scipy only load on instances that keep the index
+    from similarity import SimilarityIndex
+    similarity_index = SimilarityIndex(SIMILARITY_DIR,
+                                       SIMILARITY_MAX_SEGMENTS)
 
-def extract_category(tag_list):
-    list_of_dict = []
-    for i in range(len(tag_list)):
-        temp_list = []
-        for j in range(len(tag_list[i])):
-            temp_list.append(tag_list[i][j]['term'])
-        list_of_dict.append({'term': temp_list})
-    return list_of_dict
-
-
-def extract_column(df_file):
-    # Extracting information
-    pub_list = df_file['published'].values
-    upd_list = df_file['updated'].values
-    pub_dt = pd.DataFrame({'published_datetime': [
-        datetime.strptime(item, "%Y-%m-%dT%H:%M:%SZ") for item in pub_list]})
-    upd_dt = pd.DataFrame({'updated_datetime': [
-        datetime.strptime(item, "%Y-%m-%dT%H:%M:%SZ") for item in upd_list]})
-
-    tag_list = df_file['tags'].tolist()  # tolist works better than values here
-    category_tags = pd.DataFrame({'category_tags': extract_category(tag_list)})
-
-    df_file['unique_id'] = df_file['id'].str.extract(
-        '(\d\d\d\d\.\d\d\d\d\d)', expand=True)
-    df_file['version_number'] = df_file['id'].str.extract('(\d$)', expand=True)
-
-    final_df = df_file[['unique_id', 'version_number', 'author',
-                        'title', 'summary', 'arxiv_comment', 'authors']]
-
-    final_df = pd.concat([final_df, category_tags, pub_dt, upd_dt], axis=1)
-
-    final_df = final_df.drop_duplicates(subset='unique_id',
-                                        keep='first', inplace=False)
-
-    final_df = final_df.dropna(subset=['unique_id'], inplace=False)
-
-    return final_df
-
-
-def check_existence(session, id_string):
-    query = session.query(PaperTable).filter(
-        PaperTable.c.id == id_string).all()
-
-    return len(query) > 0
-
-
-def update_existing_articles(session, id_string, df):
-    upd = update(PaperTable).where(PaperTable.c.id == id_string).\
-        values(version=int(df.iloc[0, 1]),
-               summary=df.iloc[0, 4],
-               arxiv_comment=df.iloc[0, 5],
-               updated_datetime=df.iloc[0, 9])
-
-    # Execute for transient state, commit for persistent state
-    session.execute(upd)
-    session.commit()
-
-
-def insert_new_articles(session, id_string, df):
-    # Adding records into Paper Table
-    paper_row = PaperTable.insert().values(id=id_string,
-                                           version=int(df.iloc[0, 1]),
-                                           author=df.iloc[0, 2],
-                                           title=df.iloc[0, 3],
-                                           summary=df.iloc[0, 4],
-                                           arxiv_comment=df.iloc[0, 5],
-                                           tags=df.iloc[0, 7],
-                                           published_datetime=df.iloc[0, 8],
-                                           updated_datetime=df.iloc[0, 9])
-
-    session.execute(paper_row)
-    session.commit()
-
-    # Adding records into Author Table
-    authors = df.iloc[0, 6]
-    for i in range(len(authors)):
-        id_str = id_string + "-" + str(i)
-        author_row = AuthorTable.insert().values(id=id_str,
-                                                 author=authors[i],
-                                                 paper_id=id_string)
-
-        session.execute(author_row)
-        session.commit()
-
-
-def insert_new_articles_initiation(session, id_string, df):
-    paper_row = PaperTable(id=id_string,
-                           version=int(df.iloc[0, 1]),
-                           author=df.iloc[0, 2],
-                           title=df.iloc[0, 3],
-                           summary=df.iloc[0, 4],
-                           arxiv_comment=df.iloc[0, 5],
-                           tags=df.iloc[0, 7],
-                           published_datetime=df.iloc[0, 8],
-                           updated_datetime=df.iloc[0, 9])
-    session.add(paper_row)
-    session.commit()
-
-    authors = df.iloc[0, 6]
-    for i in range(len(authors)):
-        id_str = id_string + "-" + str(i)
-        author_row = AuthorTable(id=id_str,
-                                 author=authors[i],
-                                 author_entry=paper_row)
-        session.add(author_row)
-        session.commit()
+snapshot = ParquetSnapshot(PARQUET_DIR) if PARQUET_DIR else None
 
+# Shared by the query entry points of this instance
+query_cache = QueryCache(QUERY_CACHE_SIZE)
 
-def initiate_database(request):
-    new_articles = arxiv.query(search_query, max_results=FETCH_MAX,
-                               sort_by="lastUpdatedDate",
-                               sort_order="descending")
-    new_articles_df = pd.DataFrame.from_dict(new_articles)
-    print("Successfully retrieved articles from arXiv.")
-    ordered_new_articles = new_articles_df.reindex(
-        columns=['title', 'author', 'authors', 'id', 'arxiv_comment',
-                 'arxiv_primary_category', 'published', 'summary',
-                 'tags', 'updated'])
-    article_df = extract_column(ordered_new_articles)
-    article_id_lst = article_df['unique_id'].values
-
-    Session = sessionmaker(bind=engine)
-    session = Session()
 
+def result_ids(key):
+    return lambda results: [result[key] for result in results]
+
+
+def cache_tags(records):
+    # Written papers can enter any search or category listing and any
+    # page of their authors, not only the entries that already hold them
+    tags = {'search', 'similar', 'duplicates', 'subscriptions'}
+    for record in records:
+        tags.update('category:' + term for term in record['tags']['term'])
+        tags.update(f"author:{author_key(name)}"
+                    for name in record['authors'])
+    return tags
+
+
+def active_subscriptions():
+    with engine.begin() as connection:
+        ensure_subscription(connection, *default_subscription)
+        return load_subscriptions(connection)
+
+
+def ingest(queries, start, incremental=True, write=upsert_articles,
+           matcher=None):
+    # duplicates.py needs numpy, which query-only cold starts never load
+    from duplicates import link_duplicates
+
+    with engine.begin() as connection:
+        points = {query: resume_point(connection, query, start, incremental)
+                  for query in queries}
+    high_watermarks = {query: point[2] for query, point in points.items()}
+
+    count_update = 0
     count_insert = 0
-    for id_string in article_id_lst:
-        row_df = article_df[article_df['unique_id'] == id_string]
-        insert_new_articles_initiation(session, id_string, row_df)
-        count_insert += 1
+    seen = {}
+    written_ids = set()
+    complete = set()
+
+    shards = {query: point[:2] for query, point in points.items()}
+    # Closed on the way out, so shard threads never outlive a failed run
+    with closing(fetch_sharded(shards)) as pages:
+        for query, offset, records, finished in pages:
+            # The checkpoint commits together with the batch it describes
+            with engine.begin() as connection:
+                new, newer, unchanged = classify_batch(
+                    connection, merge_latest(records, seen))
+                unmatched = 0
+                if matcher is not None:
+                    # New papers no subscription wants are not collected; ones
+                    # already collected keep receiving their new versions
+                    matches = {record['id']: matcher.match(record)
+                               for record in new + newer}
+                    kept = [record for record in new if matches[record['id']]]
+                    unmatched = len(new) - len(kept)
+                    new = kept
+                record_versions(connection, new + newer)
+                inserted, updated = write(connection, new + newer)
+                if matcher is not None:
+                    tag_subscriptions(connection, {record['id']:
+                                                   matches[record['id']]
+                                                   for record in new + newer})
+                record_citations(connection, new + newer)
+                link_duplicates(connection, new + newer)
+                high_watermarks[query] = latest_update(
+                    records, high_watermarks[query])
+                save_state(connection, query, points[query][0],
+                           high_watermarks[query], offset, RUNNING)
+            if similarity_index is not None:
+                similarity_index.append(new + newer)
+            if SEARCH_ENGINE == 'sqlite':
+                # Postgres keeps search_vector current in the writers
+                search_engine.index(new + newer)
+            if new or newer:
+                query_cache.invalidate(
+                    [record['id'] for record in new + newer],
+                    cache_tags(new + newer))
+            written_ids.update(record['id'] for record in new + newer)
+            if finished:
+                complete.add(query)
+            count_insert += inserted
+            count_update += updated
+            print(f"Fetch #: {offset}, skipped {len(unchanged)} unchanged, "
+                  f"{unmatched} unmatched.")
+
+    # A query cut short by FETCH_MAX stays RUNNING at its old watermark, so
+    # the next run fetches the rest before the watermark moves
+    with engine.begin() as connection:
+        for query in complete:
+            save_state(connection, query, high_watermarks[query],
+                       high_watermarks[query], 0, DONE)
+    if snapshot is not None and written_ids:
+        with engine.connect() as connection:
+            months = snapshot.refresh(connection, written_ids)
+        print(f"Parquet: rewrote {len(months)} monthly partitions.")
+    transport.save()
+    print(f"Transport: {transport.report()}")
+    print(f"Query cache: {query_cache.report()}")
+
+    return count_insert, count_update
+
+
+def initiate_database(request):
+    create_tables()
+
+    defer = BULK_LOAD == 'copy' and DEFER_INDEXES
+    if defer:
+        with engine.begin() as connection:
+            drop_indexes(connection)
+
+    # The indexes come back even when the load fails, so later updates
+    # never run without them
+    try:
+        subscriptions = active_subscriptions()
+        write = copy_articles if BULK_LOAD == 'copy' else upsert_articles
+        count_insert, count_update = ingest(shard_queries(subscriptions), 0,
+                                            incremental=False, write=write,
+                                            matcher=SubscriptionMatcher(
+                                                subscriptions))
+    finally:
+        if defer:
+            with engine.begin() as connection:
+                create_indexes(connection)
 
-    session.close()
     return f'Completed: Inserted {count_insert} new articles.'
 
 
 def update_database(data, context):
-    connection = engine.connect()
-    print("Existing tables:", engine.table_names())
+    # One fetch over the union of all subscriptions, matched locally
+    subscriptions = active_subscriptions()
+    count_insert, count_update = ingest([union_query(subscriptions)],
+                                        START_INDEX,
+                                        matcher=SubscriptionMatcher(
+                                            subscriptions))
+    return f"Completed: Inserted {count_insert} new articles, updated {count_update} existing articles."
 
-    # reflect the tables
-    metadata = MetaData()
 
-    # Mapped classes with names matching that of the table name
-    PaperTable = Table('PaperTable', metadata, autoload=True,
-                       autoload_with=engine)
-    AuthorTable = Table('AuthorTable', metadata, autoload=True,
-                        autoload_with=engine)
+def search_papers(request):
+    query = request.args.get('q', '')
+    page = max(int(request.args.get('page', 1)), 1)
+    size = min(int(request.args.get('size', SEARCH_PAGE_SIZE)),
+               SEARCH_MAX_PAGE_SIZE)
 
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    results = query_cache.get(
+        ('search', query, page, size),
+        lambda: search_engine.search(query, size, (page - 1) * size),
+        SEARCH_CACHE_TTL, result_ids('id'), ['search'])
+    body = json.dumps({'query': query, 'page': page, 'results': results})
+    return body, 200, {'Content-Type': 'application/json'}
 
-    latest_update = session.query(
-        func.max(PaperTable.c.updated_datetime)).first()[0]
-    article_df = extract_column(obtain_new_articles())
-    fetch_total = FETCH_MAX
-    while latest_update < article_df['updated_datetime'].min():
-        fetch_total += FETCH_ADDITIONAL
-        article_df = extract_column(obtain_new_articles())
-        print(f"Fetch #: {fetch_total}")
 
-    article_id_lst = article_df['unique_id'].values
+def latest_papers(request):
+    category = request.args.get('category', 'cs.LG')
+    since = request.args.get('since')
+    since = datetime.strptime(since, "%Y-%m-%d") if since else None
+    limit = min(int(request.args.get('limit', 50)), SEARCH_MAX_PAGE_SIZE)
 
-    count_update = 0
-    count_insert = 0
+    def compute():
+        with engine.connect() as connection:
+            return latest_in_category(connection, category, since, limit)
 
-    for id_string in article_id_lst:
-        row_df = article_df[article_df['unique_id'] == id_string]
+    papers = query_cache.get(('latest', category, since, limit), compute,
+                             LATEST_CACHE_TTL, result_ids('id'),
+                             ['category:' + category])
+    body = json.dumps({'category': category, 'papers': papers}, default=str)
+    return body, 200, {'Content-Type': 'application/json'}
 
-        if check_existence(session, id_string):
-            exist_version = session.query(PaperTable.c.version).\
-                filter(PaperTable.c.id == id_string).one()
-            if int(article_df.iloc[0, 1]) > exist_version[0]:
-                update_existing_articles(session, id_string, row_df)
-                count_update += 1
 
-        else:
-            insert_new_articles(session, id_string, row_df)
-            count_insert += 1
+def export_papers(request):
+    from flask import Response
 
-    session.close()
-    return f"Completed: Inserted {count_insert} new articles, updated {count_update} existing articles."
+    columns = request.args.get('columns')
+    columns = columns.split(',') if columns else EXPORT_COLUMNS
+    unknown = set(columns) - set(EXPORT_COLUMNS)
+    if unknown:
+        return f"Unknown columns: {', '.join(sorted(unknown))}", 400
+
+    since = request.args.get('since')
+    since = datetime.strptime(since, "%Y-%m-%d") if since else None
+    limit = request.args.get('limit')
+
+    rows = iter_papers(engine, columns, since, request.args.get('cursor'),
+                       EXPORT_PAGE_SIZE, int(limit) if limit else None)
+    return Response((to_ndjson(row) for row in rows),
+                    mimetype='application/x-ndjson')
+
+
+def author_papers(request):
+    name = request.args.get('name', '')
+
+    def compute():
+        with engine.connect() as connection:
+            return {'papers': papers_by_author(connection, name),
+                    'coauthors': [dict(row)
+                                  for row in coauthors(connection, name)]}
+
+    page = query_cache.get(('author', author_key(name)), compute,
+                           AUTHOR_CACHE_TTL, lambda page: page['papers'],
+                           [f"author:{author_key(name)}"])
+    body = json.dumps(dict(page, name=name))
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def similar_papers(request):
+    id = request.args.get('id', '')
+    k = min(int(request.args.get('k', 10)), SEARCH_MAX_PAGE_SIZE)
+    if similarity_index is None:
+        return 'Similarity index is not configured.', 503
+
+    similar = query_cache.get(('similar', id, k),
+                              lambda: similarity_index.similar(id, k),
+                              SIMILAR_CACHE_TTL,
+                              lambda results: [result['id']
+                                               for result in results or ()],
+                              ['similar'])
+    if similar is None:
+        return f'Unknown paper {id}.', 404
+    body = json.dumps({'id': id, 'similar': similar})
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def duplicate_papers(request):
+    from duplicates import duplicates_of
+
+    id = request.args.get('id', '')
+
+    def compute():
+        with engine.connect() as connection:
+            return duplicates_of(connection, id)
+
+    duplicates = query_cache.get(('duplicates', id), compute,
+                                 DUPLICATE_CACHE_TTL, result_ids('id'),
+                                 ['duplicates'])
+    body = json.dumps({'id': id, 'duplicates': duplicates})
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def paper_history(request):
+    id = request.args.get('id', '')
+
+    def compute():
+        with engine.connect() as connection:
+            return history_of(connection, id)
+
+    versions = query_cache.get(('history', id), compute, HISTORY_CACHE_TTL,
+                               lambda versions: [id])
+    body = json.dumps({'id': id, 'versions': versions}, default=str)
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def add_subscription(request):
+    subscription = request.get_json(silent=True) or {}
+    name = subscription.get('name')
+    phrases = subscription.get('phrases', [])
+    categories = subscription.get('categories', [])
+    if not name or not all(isinstance(value, list) and
+                           all(isinstance(item, str) for item in value)
+                           for value in (phrases, categories)):
+        return 'Expected a name and lists of phrases and categories.', 400
+
+    with engine.begin() as connection:
+        id = save_subscription(connection, name, phrases, categories)
+    body = json.dumps({'id': id, 'name': name})
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def subscription_papers(request):
+    name = request.args.get('name', '')
+    limit = min(int(request.args.get('limit', 50)), SEARCH_MAX_PAGE_SIZE)
+
+    def compute():
+        with engine.connect() as connection:
+            return papers_for_subscription(connection, name, limit)
+
+    papers = query_cache.get(('subscription', name, limit), compute,
+                             LATEST_CACHE_TTL, result_ids('id'),
+                             ['subscriptions'])
+    body = json.dumps({'name': name, 'papers': papers}, default=str)
+    return body, 200, {'Content-Type': 'application/json'}
+
+
+def cache_stats(request):
+    body = json.dumps(query_cache.report())
+    return body, 200, {'Content-Type': 'application/json'}
@@ -0,0 +1,65 @@
+import re
+from collections import deque
+
+# arXiv search splits words on hyphens and punctuation as well as spaces, so
+# "deep-learning-based" and "Neural-network surrogates" hold its phrases
+NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    return ' '.join(NON_WORD.sub(' ', (text or '').lower()).split())
+
+
+class PhraseMatcher:
+    # Aho-Corasick automaton over normalized phrases. One pass over a text
+    # finds every phrase in it, so the cost follows the text length, not
+    # the number of phrases. A phrase must start at a word boundary but
+    # may run into a longer word, so "neural network" also matches
+    # "neural networks" the way arXiv's stemmed search does.
+    def __init__(self, phrases):
+        self.phrases = [normalize(phrase) for phrase in phrases]
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for index, phrase in enumerate(self.phrases):
+            node = 0
+            for char in phrase:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][char] = child
+                node = child
+            self.output[node].append(index)
+
+        # Breadth first, so a node's failure target is always complete
+        # before its children look through it
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] + \
+                    self.output[self.fail[child]]
+
+    def find(self, text):
+        # Indexes of the phrases found in text
+        text = normalize(text)
+        found = set()
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for index in self.output[node]:
+                start = end - len(self.phrases[index]) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    found.add(index)
+        return found
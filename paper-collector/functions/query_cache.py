@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class Entry:
+    __slots__ = ('value', 'expires', 'ids', 'tags')
+
+    def __init__(self, value, expires, ids, tags):
+        self.value = value
+        self.expires = expires
+        self.ids = ids
+        self.tags = tags
+
+
+class Pending:
+    # A computation other callers for the same key wait on
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    # Bounded LRU of query results with a TTL per entry. Concurrent misses
+    # on one key compute once, and entries are dropped by the paper ids
+    # they contain or by tags such as a category they list.
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.keys_by_id = defaultdict(set)
+        self.keys_by_tag = defaultdict(set)
+        self.pending = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0,
+                      'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key, compute, ttl, ids=lambda value: (), tags=()):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry.value
+            if entry is not None:
+                self.remove(key)
+                self.stats['expirations'] += 1
+
+            waiting = self.pending.get(key)
+            if waiting is None:
+                waiting = self.pending[key] = Pending()
+                owner = True
+                generation = self.generation
+                self.stats['misses'] += 1
+            else:
+                owner = False
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            waiting.event.wait()
+            if waiting.error is not None:
+                raise waiting.error
+            return waiting.value
+
+        try:
+            waiting.value = compute()
+        except Exception as error:
+            waiting.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+                # A write landing mid-compute may have made this stale
+                if waiting.error is None and generation == self.generation:
+                    self.store(key, Entry(waiting.value,
+                                          time.monotonic() + ttl,
+                                          set(ids(waiting.value)),
+                                          set(tags)))
+            waiting.event.set()
+
+        return waiting.value
+
+    def store(self, key, entry):
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = entry
+        for id in entry.ids:
+            self.keys_by_id[id].add(key)
+        for tag in entry.tags:
+            self.keys_by_tag[tag].add(key)
+
+        while len(self.entries) > self.max_entries:
+            self.remove(next(iter(self.entries)))
+            self.stats['evictions'] += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        for id in entry.ids:
+            self.unlink(self.keys_by_id, id, key)
+        for tag in entry.tags:
+            self.unlink(self.keys_by_tag, tag, key)
+
+    @staticmethod
+    def unlink(index, name, key):
+        keys = index[name]
+        keys.discard(key)
+        if not keys:
+            del index[name]
+
+    def invalidate(self, ids=(), tags=()):
+        with self.lock:
+            self.generation += 1
+            keys = set()
+            for id in ids:
+                keys.update(self.keys_by_id.get(id, ()))
+            for tag in tags:
+                keys.update(self.keys_by_tag.get(tag, ()))
+            for key in keys:
+                self.remove(key)
+            self.stats['invalidations'] += len(keys)
+
+    def report(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
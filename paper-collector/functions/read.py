@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from tables import PaperTable
+
+paper_table = PaperTable.__table__
+
+EXPORT_COLUMNS = ['id', 'version', 'author', 'title', 'summary',
+                  'arxiv_comment', 'tags', 'published_datetime',
+                  'updated_datetime']
+
+
+def encode_cursor(updated_datetime, id):
+    value = json.dumps([updated_datetime.isoformat()
+                        if updated_datetime is not None else None, id])
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    updated, id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return (datetime.fromisoformat(updated) if updated is not None
+            else None), id
+
+
+def read_page(connection, columns, since=None, after=None, limit=1000):
+    # Seeks on ix_papertable_updated_id to the row after the cursor, so
+    # every page costs the same however deep the export is. A cursor
+    # without an updated_datetime pages through the papers that have none,
+    # by id.
+    updated = paper_table.c.updated_datetime
+    stmt = select([paper_table.c[column] for column in columns] +
+                  [updated.label('_updated'), paper_table.c.id.label('_id')]) \
+        .limit(limit)
+    if after is not None and after[0] is None:
+        stmt = stmt.where(updated.is_(None)) \
+            .where(paper_table.c.id > after[1]) \
+            .order_by(paper_table.c.id)
+        return connection.execute(stmt).fetchall()
+
+    stmt = stmt.where(updated.isnot(None)).order_by(updated, paper_table.c.id)
+    if since is not None:
+        stmt = stmt.where(updated >= since)
+    if after is not None:
+        stmt = stmt.where(tuple_(updated, paper_table.c.id) > tuple_(*after))
+
+    return connection.execute(stmt).fetchall()
+
+
+def iter_papers(engine, columns=EXPORT_COLUMNS, since=None, cursor=None,
+                page_size=1000, limit=None):
+    # Yields one dict per paper in (updated_datetime, id) order, then a
+    # final {'next_cursor': ...} if limit cut the export short. Papers with
+    # no updated_datetime come last, and are left out when since is given.
+    after = decode_cursor(cursor) if cursor else None
+    dated = after is None or after[0] is not None
+    remaining = limit
+
+    with engine.connect() as connection:
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None \
+                else min(page_size, remaining)
+            rows = read_page(connection, columns, since, after, size)
+
+            for row in rows:
+                yield {column: row[column] for column in columns}
+            if rows:
+                after = (rows[-1]._updated, rows[-1]._id)
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                if not dated or since is not None:
+                    return
+                dated = False
+                after = (None, '')
+
+    if after is not None:
+        yield {'next_cursor': encode_cursor(*after)}
+
+
+def to_ndjson(row):
+    return json.dumps(row, default=lambda value: value.isoformat()) + '\n'
@@ -0,0 +1,65 @@
+import re
+from datetime import datetime
+
+UNIQUE_ID = re.compile(r'(\d\d\d\d\.\d\d\d\d\d)')
+VERSION = re.compile(r'v(\d+)$')
+
+
+def parse_timestamp(value):
+    # Fixed "%Y-%m-%dT%H:%M:%SZ" layout, sliced instead of strptime'd
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                    int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+
+class PaperRow:
+    # Everything PaperTable and AuthorTable need for one paper. Indexing
+    # by field name lets the writers take these in place of dict records.
+    __slots__ = ('id', 'version', 'author', 'title', 'summary',
+                 'arxiv_comment', 'tags', 'published_datetime',
+                 'updated_datetime', 'authors')
+
+    def __init__(self, id, version, author, title, summary, arxiv_comment,
+                 tags, published_datetime, updated_datetime, authors):
+        self.id = id
+        self.version = version
+        self.author = author
+        self.title = title
+        self.summary = summary
+        self.arxiv_comment = arxiv_comment
+        self.tags = tags
+        self.published_datetime = published_datetime
+        self.updated_datetime = updated_datetime
+        self.authors = authors
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+
+def paper_rows(entries):
+    rows = []
+    seen = set()
+    for entry in entries:
+        arxiv_id = entry.get('id') or ''
+        unique_id = UNIQUE_ID.search(arxiv_id)
+        version = VERSION.search(arxiv_id)
+        if unique_id is None or version is None:
+            continue
+
+        # First occurrence wins, as with drop_duplicates(keep='first')
+        unique_id = unique_id.group(1)
+        if unique_id in seen:
+            continue
+        seen.add(unique_id)
+
+        rows.append(PaperRow(
+            unique_id,
+            int(version.group(1)),
+            entry.get('author'),
+            entry.get('title'),
+            entry.get('summary'),
+            entry.get('arxiv_comment'),
+            {'term': [tag['term'] for tag in entry.get('tags') or []]},
+            parse_timestamp(entry['published']),
+            parse_timestamp(entry['updated']),
+            entry.get('authors') or []))
+    return rows
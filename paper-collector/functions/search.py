@@ -0,0 +1,94 @@
+import sqlite3
+from sqlalchemy import text, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from tables import PaperTable
+
+paper_table = PaperTable.__table__
+
+# Title outweighs summary, which outweighs the comment
+SEARCH_DOCUMENT = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(arxiv_comment, '')), 'C')"""
+
+HIGHLIGHT_OPTIONS = 'StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=25'
+
+
+def refresh_search_vectors(connection, ids):
+    # Called by the writers for the papers they just changed
+    if not ids:
+        return
+    stmt = text(f'UPDATE "{paper_table.name}" '
+                f'SET search_vector = {SEARCH_DOCUMENT} '
+                f'WHERE id = ANY(:ids)').bindparams(
+                    bindparam('ids', type_=ARRAY(String)))
+    connection.execute(stmt, ids=list(ids))
+
+
+class PostgresSearchEngine:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def search(self, query, limit, offset=0):
+        # Ranks over the GIN index first, then highlights only the page
+        stmt = text(f"""
+            SELECT ranked.id, ranked.rank,
+                   ts_headline('english', ranked.title, ranked.q,
+                               :options) AS title_highlight,
+                   ts_headline('english', coalesce(ranked.summary, ''),
+                               ranked.q, :options) AS summary_highlight
+            FROM (SELECT id, title, summary, q,
+                         ts_rank_cd(search_vector, q) AS rank
+                  FROM "{paper_table.name}",
+                       websearch_to_tsquery('english', :query) q
+                  WHERE search_vector @@ q
+                  ORDER BY rank DESC, id
+                  LIMIT :limit OFFSET :offset) ranked
+            ORDER BY ranked.rank DESC, ranked.id""")
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(stmt, query=query, limit=limit,
+                                      offset=offset,
+                                      options=HIGHLIGHT_OPTIONS)
+            return [dict(row) for row in rows]
+
+
+class SqliteSearchEngine:
+    # FTS5 stand-in with the same weighting, for running without Postgres
+    WEIGHTS = (0.0, 10.0, 4.0, 1.0)
+
+    def __init__(self, path=':memory:'):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS papers USING '
+                        'fts5(id UNINDEXED, title, summary, arxiv_comment)')
+
+    def index(self, records):
+        with self.db:
+            self.db.executemany('DELETE FROM papers WHERE id = ?',
+                                [(record['id'],) for record in records])
+            self.db.executemany(
+                'INSERT INTO papers VALUES (?, ?, ?, ?)',
+                [(record['id'], record['title'], record['summary'] or '',
+                  record['arxiv_comment'] or '') for record in records])
+
+    @staticmethod
+    def match_expression(query):
+        # Every term quoted, so user input cannot break the FTS syntax
+        return ' '.join('"' + term.replace('"', '""') + '"'
+                        for term in query.split())
+
+    def search(self, query, limit, offset=0):
+        if not query.split():
+            return []
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        rows = self.db.execute(
+            f"""SELECT id, -bm25(papers, {weights}) AS rank,
+                       highlight(papers, 1, '<b>', '</b>'),
+                       snippet(papers, 2, '<b>', '</b>', '...', 25)
+                FROM papers WHERE papers MATCH ?
+                ORDER BY rank DESC, id LIMIT ? OFFSET ?""",
+            (self.match_expression(query), limit, offset))
+
+        return [{'id': id, 'rank': rank, 'title_highlight': title,
+                 'summary_highlight': summary}
+                for id, rank, title, summary in rows]
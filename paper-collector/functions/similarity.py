@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+import numpy as np
+from scipy import sparse
+
+# Terms are hashed into a fixed number of columns, so the vocabulary never
+# has to be stored or grown
+DIMENSIONS = 2 ** 18
+
+TOKEN = re.compile(r'[a-z][a-z0-9]+')
+
+STOP_WORDS = frozenset("""
+    a an and are as at be by can for from has have in is it its of on or
+    our that the their these this to was we which with using based paper
+    show propose proposed approach method results new""".split())
+
+MANIFEST = 'manifest.json'
+DOC_FREQ = 'df.npy'
+
+SEGMENT_ARRAYS = ['ids', 'row_indptr', 'row_indices', 'row_data',
+                  'col_indptr', 'col_indices', 'col_data']
+
+
+def term_counts(record):
+    text = f"{record['title']} {record['summary'] or ''}".lower()
+    return Counter(zlib.crc32(token.encode('utf-8')) & (DIMENSIONS - 1)
+                   for token in TOKEN.findall(text)
+                   if token not in STOP_WORDS)
+
+
+def weigh(counts, doc_freq, doc_count):
+    # Log term frequency times smoothed idf, scaled to unit length so a
+    # dot product is the cosine similarity
+    indptr = [0]
+    indices = []
+    data = []
+    for terms in counts:
+        indices.extend(terms.keys())
+        data.extend(terms.values())
+        indptr.append(len(indices))
+
+    idf = np.log((1 + doc_count) / (1 + doc_freq)) + 1
+    matrix = sparse.csr_matrix(
+        (np.log1p(np.asarray(data, dtype=np.float32)),
+         np.asarray(indices, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(counts), DIMENSIONS))
+    matrix.data *= idf[matrix.indices].astype(np.float32)
+
+    norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def write_segment(path, ids, matrix):
+    # Written under a temporary name and renamed, so a reader never maps a
+    # half-written segment
+    rows = matrix.tocsr()
+    rows.sort_indices()
+    columns = matrix.tocsc()
+    columns.sort_indices()
+    arrays = {'ids': np.asarray(ids, dtype=str),
+              'row_indptr': rows.indptr, 'row_indices': rows.indices,
+              'row_data': rows.data.astype(np.float32),
+              'col_indptr': columns.indptr, 'col_indices': columns.indices,
+              'col_data': columns.data.astype(np.float32)}
+
+    temp_path = path + '.tmp'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_path, name + '.npy'), array)
+    os.replace(temp_path, path)
+
+
+class Segment:
+    # One immutable, memory-mapped block of paper vectors, kept both by row
+    # for looking a paper up and by column for scoring a query against it
+    def __init__(self, path):
+        arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                                mmap_mode='r')
+                  for name in SEGMENT_ARRAYS}
+        self.ids = arrays['ids']
+        shape = (len(self.ids), DIMENSIONS)
+        self.rows = sparse.csr_matrix(
+            (arrays['row_data'], arrays['row_indices'], arrays['row_indptr']),
+            shape=shape, copy=False)
+        self.columns = sparse.csc_matrix(
+            (arrays['col_data'], arrays['col_indices'], arrays['col_indptr']),
+            shape=shape, copy=False)
+        self.live = np.ones(len(self.ids), dtype=bool)
+
+
+class SimilarityIndex:
+    # Hashed TF-IDF vectors of title and summary in append-only segments
+    # under root. Every append writes a new segment, and a paper's newest
+    # row shadows the rows of its earlier versions. The idf of a segment is
+    # frozen when it is written. After an append the newest segments are
+    # merged while the one before them is no larger than they are together,
+    # like a binary counter, so each row is rewritten O(log n) times and
+    # at most max_segments remain. rebuild() reweighs everything.
+    def __init__(self, root, max_segments):
+        self.root = root
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.loaded = None
+        self.manifest = {'doc_count': 0, 'next': 0, 'segments': []}
+        self.doc_freq = np.zeros(DIMENSIONS, dtype=np.int64)
+        self.names = []
+        self.segments = []
+        self.positions = {}
+
+    def refresh(self):
+        # Picks up segments written by another process since the last load
+        try:
+            stamp = os.stat(os.path.join(self.root, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if stamp == self.loaded:
+            return
+
+        with open(os.path.join(self.root, MANIFEST)) as manifest:
+            self.manifest = json.load(manifest)
+        self.doc_freq = np.load(os.path.join(self.root, DOC_FREQ))
+
+        # Segments are never rewritten in place, so the ones both manifests
+        # start with stay loaded and only the rest are walked
+        names = self.manifest['segments']
+        kept = 0
+        while kept < min(len(names), len(self.names)) and \
+                names[kept] == self.names[kept]:
+            kept += 1
+        for i in range(kept, len(self.segments)):
+            for id in self.segments[i].ids.tolist():
+                if self.positions.get(id, (None,))[0] == i:
+                    del self.positions[id]
+        self.segments = self.segments[:kept] + \
+            [Segment(os.path.join(self.root, name)) for name in names[kept:]]
+        self.names = list(names)
+
+        for i in range(kept, len(self.segments)):
+            for row, id in enumerate(self.segments[i].ids.tolist()):
+                previous = self.positions.get(id)
+                if previous is not None:
+                    self.segments[previous[0]].live[previous[1]] = False
+                self.positions[id] = (i, row)
+        self.loaded = stamp
+
+    def save(self, segments, doc_freq, doc_count):
+        os.makedirs(self.root, exist_ok=True)
+        np.save(os.path.join(self.root, 'df.tmp.npy'), doc_freq)
+        os.replace(os.path.join(self.root, 'df.tmp.npy'),
+                   os.path.join(self.root, DOC_FREQ))
+
+        manifest = {'doc_count': doc_count, 'next': self.manifest['next'],
+                    'segments': segments}
+        temp_path = os.path.join(self.root, MANIFEST + '.tmp')
+        with open(temp_path, 'w') as temp:
+            json.dump(manifest, temp)
+        os.replace(temp_path, os.path.join(self.root, MANIFEST))
+
+        # Segments the new manifest no longer lists can go. Readers that
+        # still map them keep their open files.
+        for name in os.listdir(self.root):
+            if name.startswith('segment-') and name not in segments:
+                shutil.rmtree(os.path.join(self.root, name),
+                              ignore_errors=True)
+
+    def new_segment(self, ids, matrix):
+        name = f"segment-{self.manifest['next']:06d}"
+        self.manifest['next'] += 1
+        write_segment(os.path.join(self.root, name), ids, matrix)
+        return name
+
+    def append(self, records):
+        if not records:
+            return
+        with self.lock:
+            self.refresh()
+            counts = [term_counts(record) for record in records]
+            doc_freq = self.doc_freq.copy()
+            for terms in counts:
+                doc_freq[list(terms)] += 1
+            doc_count = self.manifest['doc_count'] + len(records)
+
+            os.makedirs(self.root, exist_ok=True)
+            name = self.new_segment([record['id'] for record in records],
+                                    weigh(counts, doc_freq, doc_count))
+            self.save(self.manifest['segments'] + [name], doc_freq,
+                      doc_count)
+            self.refresh()
+
+            first = len(self.segments) - 1
+            size = np.count_nonzero(self.segments[first].live)
+            while first > 0 and \
+                    (np.count_nonzero(self.segments[first - 1].live) <= size
+                     or first + 1 > self.max_segments):
+                first -= 1
+                size += np.count_nonzero(self.segments[first].live)
+            if first < len(self.segments) - 1:
+                self.merge(first)
+
+    def merge(self, first):
+        # Rewrites the live rows of segments[first:] as one segment in
+        # their place, so newer rows still come after older ones
+        ids = []
+        blocks = []
+        for segment in self.segments[first:]:
+            live = np.flatnonzero(segment.live)
+            ids.extend(segment.ids[live].tolist())
+            blocks.append(segment.rows[live])
+        name = self.new_segment(ids, sparse.vstack(blocks, format='csr'))
+        self.save(self.manifest['segments'][:first] + [name], self.doc_freq,
+                  self.manifest['doc_count'])
+        self.refresh()
+
+    def compact(self):
+        with self.lock:
+            self.refresh()
+            if len(self.segments) > 1:
+                self.merge(0)
+
+    def rebuild(self, records):
+        # Offline build from the whole corpus, with one idf for every row
+        with self.lock:
+            self.refresh()
+            ids = []
+            counts = []
+            doc_freq = np.zeros(DIMENSIONS, dtype=np.int64)
+            for record in records:
+                terms = term_counts(record)
+                doc_freq[list(terms)] += 1
+                ids.append(record['id'])
+                counts.append(terms)
+
+            os.makedirs(self.root, exist_ok=True)
+            name = self.new_segment(ids, weigh(counts, doc_freq, len(ids)))
+            self.save([name], doc_freq, len(ids))
+            self.refresh()
+
+    def search(self, vector, k, exclude=None):
+        # Scores only the columns of the query's terms, so the cost follows
+        # their posting lists rather than the size of the corpus
+        terms = vector.indices
+        weights = vector.data
+        candidates = []
+        for segment in self.segments:
+            scores = segment.columns[:, terms].dot(weights)
+            scores[~segment.live] = 0
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k + 1]
+            candidates.extend((float(scores[row]), segment.ids[row])
+                              for row in top if scores[row] > 0)
+
+        candidates.sort(reverse=True)
+        return [{'id': str(id), 'score': score}
+                for score, id in candidates if id != exclude][:k]
+
+    def similar(self, id, k=10):
+        with self.lock:
+            self.refresh()
+            position = self.positions.get(id)
+            if position is None:
+                return None
+            segment, row = position
+            return self.search(self.segments[segment].rows[row], k, id)
+
+    def similar_to_text(self, title, summary, k=10):
+        with self.lock:
+            self.refresh()
+            counts = [term_counts({'title': title, 'summary': summary})]
+            vector = weigh(counts, self.doc_freq,
+                           self.manifest['doc_count'])[0]
+            return self.search(vector, k)
+
+
+if __name__ == '__main__':
+    from constants import *
+    from tables import engine
+    from read import iter_papers
+
+    parser = argparse.ArgumentParser(
+        description='Rebuild the similarity index from PaperTable.')
+    parser.add_argument('--root', default=SIMILARITY_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SimilarityIndex(args.root, SIMILARITY_MAX_SEGMENTS)
+    index.rebuild(iter_papers(engine, ['id', 'title', 'summary'],
+                              page_size=EXPORT_PAGE_SIZE))
+    print(f"{len(index.positions)} papers indexed in "
+          f"{time.perf_counter() - start:.2f}s")
@@ -0,0 +1,160 @@
+import argparse
+import os
+import shutil
+import time
+from datetime import datetime
+from sqlalchemy import select, func, and_, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from constants import *
+from tables import engine, PaperTable, AuthorDimTable, PaperAuthorTable
+
+paper_table = PaperTable.__table__
+author_dim_table = AuthorDimTable.__table__
+paper_author_table = PaperAuthorTable.__table__
+
+# Hive-style directory name, so readers can filter on the month without
+# opening any file
+PARTITION = 'published_month'
+UNKNOWN_MONTH = 'unknown'
+
+PAPER_COLUMNS = ['id', 'version', 'author', 'title', 'summary',
+                 'arxiv_comment', 'published_datetime', 'updated_datetime']
+AUTHOR_COLUMNS = ['paper_id', 'position', 'name']
+
+
+def schemas():
+    # pyarrow is only needed by instances that write snapshots
+    import pyarrow as pa
+
+    papers = pa.schema([('id', pa.string()), ('version', pa.int32()),
+                        ('author', pa.string()), ('title', pa.string()),
+                        ('summary', pa.string()),
+                        ('arxiv_comment', pa.string()),
+                        ('categories', pa.list_(pa.string())),
+                        ('published_datetime', pa.timestamp('s')),
+                        ('updated_datetime', pa.timestamp('s'))])
+    authors = pa.schema([('paper_id', pa.string()),
+                         ('position', pa.int16()),
+                         ('name', pa.string())])
+    return papers, authors
+
+
+def month_of(column):
+    return func.coalesce(func.to_char(column, 'YYYY-MM'), UNKNOWN_MONTH)
+
+
+def month_filter(month):
+    published = paper_table.c.published_datetime
+    if month == UNKNOWN_MONTH:
+        return published.is_(None)
+    start = datetime.strptime(month, '%Y-%m')
+    end = start.replace(year=start.year + start.month // 12,
+                        month=start.month % 12 + 1)
+    return and_(published >= start, published < end)
+
+
+def touched_months(connection, ids):
+    stmt = select([month_of(paper_table.c.published_datetime)]) \
+        .where(paper_table.c.id == any_(bindparam('ids',
+                                                  type_=ARRAY(String)))) \
+        .distinct()
+    return sorted(row[0] for row in connection.execute(stmt, ids=list(ids)))
+
+
+def all_months(connection):
+    stmt = select([month_of(paper_table.c.published_datetime)]).distinct()
+    return sorted(row[0] for row in connection.execute(stmt))
+
+
+def read_month(connection, month):
+    # Tags are flattened to their category terms, so readers get a list
+    # column instead of JSON to parse
+    papers = connection.execute(
+        select([paper_table.c[column] for column in PAPER_COLUMNS] +
+               [paper_table.c.tags])
+        .where(month_filter(month))
+        .order_by(paper_table.c.id)).fetchall()
+    columns = {column: [row[column] for row in papers]
+               for column in PAPER_COLUMNS}
+    columns['categories'] = [list((row.tags or {}).get('term', []))
+                             for row in papers]
+
+    authors = connection.execute(
+        select([paper_author_table.c.paper_id, paper_author_table.c.position,
+                author_dim_table.c.name])
+        .select_from(paper_author_table
+                     .join(paper_table,
+                           paper_author_table.c.paper_id == paper_table.c.id)
+                     .join(author_dim_table,
+                           paper_author_table.c.author_id ==
+                           author_dim_table.c.id))
+        .where(month_filter(month))
+        .order_by(paper_author_table.c.paper_id,
+                  paper_author_table.c.position)).fetchall()
+    author_columns = {column: [row[column] for row in authors]
+                      for column in AUTHOR_COLUMNS}
+    return columns, author_columns
+
+
+class ParquetSnapshot:
+    # papers/ and authors/ datasets under root, one Parquet file per
+    # published month. A month is always rewritten whole from the database.
+    def __init__(self, root):
+        self.root = root
+
+    def partition_path(self, dataset, month):
+        return os.path.join(self.root, dataset, f"{PARTITION}={month}",
+                            'part-0.parquet')
+
+    def write_partition(self, dataset, month, columns, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self.partition_path(dataset, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so readers never see a partial file
+        temp_path = path + '.tmp'
+        pq.write_table(pa.Table.from_pydict(columns, schema=schema),
+                       temp_path, compression='snappy')
+        os.replace(temp_path, path)
+
+    def write_month(self, connection, month):
+        paper_schema, author_schema = schemas()
+        papers, authors = read_month(connection, month)
+        self.write_partition('papers', month, papers, paper_schema)
+        self.write_partition('authors', month, authors, author_schema)
+
+    def refresh(self, connection, ids):
+        # Rewrites only the months the given papers were published in
+        months = touched_months(connection, ids)
+        for month in months:
+            self.write_month(connection, month)
+        return months
+
+    def rebuild(self, connection):
+        months = all_months(connection)
+        for month in months:
+            self.write_month(connection, month)
+
+        for dataset in ('papers', 'authors'):
+            directory = os.path.join(self.root, dataset)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.split('=', 1)[-1] not in months:
+                    shutil.rmtree(os.path.join(directory, name))
+        return months
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write every month of PaperTable to Parquet.')
+    parser.add_argument('--root', default=PARQUET_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        months = ParquetSnapshot(args.root).rebuild(connection)
+    print(f"{len(months)} months written in "
+          f"{time.perf_counter() - start:.2f}s")
@@ -0,0 +1,169 @@
+import argparse
+import time
+from datetime import datetime
+from sqlalchemy import select, delete, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from constants import *
+from tables import engine, PaperTable, SubscriptionTable, \
+    PaperSubscriptionTable
+from upsert import chunked
+from bulk_load import copy_rows
+from matcher import PhraseMatcher, normalize
+from read import iter_papers
+
+paper_table = PaperTable.__table__
+subscription_table = SubscriptionTable.__table__
+paper_subscription_table = PaperSubscriptionTable.__table__
+
+LISTED_COLUMNS = ['id', 'version', 'title', 'author', 'updated_datetime']
+
+
+def load_subscriptions(connection):
+    stmt = select([subscription_table]).order_by(subscription_table.c.id)
+    return connection.execute(stmt).fetchall()
+
+
+def save_subscription(connection, name, phrases, categories):
+    values = {'phrases': phrases, 'categories': categories}
+    stmt = insert(subscription_table).values(
+        name=name, created_at=datetime.utcnow(), **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[subscription_table.c.name], set_=values)
+    return connection.execute(
+        stmt.returning(subscription_table.c.id)).scalar()
+
+
+def ensure_subscription(connection, name, phrases, categories):
+    # Adds the subscription unless one with this name already exists
+    stmt = insert(subscription_table).values(
+        name=name, phrases=phrases, categories=categories,
+        created_at=datetime.utcnow())
+    connection.execute(stmt.on_conflict_do_nothing(
+        index_elements=[subscription_table.c.name]))
+
+
+def union_query(subscriptions, category=None):
+    # Any phrase of any subscription AND any of their categories: a
+    # superset of every subscription, fetched once for all of them. A
+    # subscription without phrases or categories drops that clause.
+    phrases = sorted({normalize(phrase) for subscription in subscriptions
+                      for phrase in subscription.phrases})
+    categories = [category] if category else sorted(
+        {item for subscription in subscriptions
+         for item in subscription.categories})
+
+    clauses = []
+    if phrases and all(subscription.phrases
+                       for subscription in subscriptions):
+        clauses.append('%28' + ' OR '.join('%22' + phrase + '%22'
+                                           for phrase in phrases) + '%29')
+    if categories and (category or all(subscription.categories
+                                       for subscription in subscriptions)):
+        clauses.append('%28' + ' OR '.join('cat:' + item
+                                           for item in categories) + '%29')
+    return ' AND '.join(clauses)
+
+
+def shard_queries(subscriptions):
+    # One union query per category, fetched side by side for large pulls.
+    # A subscription without categories wants papers outside every shard,
+    # so then the single union query is fetched instead.
+    if not all(subscription.categories for subscription in subscriptions):
+        return [union_query(subscriptions)]
+    categories = sorted({item for subscription in subscriptions
+                         for item in subscription.categories})
+    return [union_query(subscriptions, item) for item in categories] \
+        or [union_query(subscriptions)]
+
+
+class SubscriptionMatcher:
+    # Every phrase of every subscription goes into one automaton, so a
+    # record's text is scanned once however many subscriptions there are
+    def __init__(self, subscriptions):
+        phrases = sorted({normalize(phrase) for subscription in subscriptions
+                          for phrase in subscription.phrases})
+        self.phrases = PhraseMatcher(phrases)
+        self.by_phrase = [set() for _ in phrases]
+        self.without_phrases = set()
+        self.categories = {}
+
+        position = {phrase: i for i, phrase in enumerate(phrases)}
+        for subscription in subscriptions:
+            self.categories[subscription.id] = set(subscription.categories)
+            if not subscription.phrases:
+                self.without_phrases.add(subscription.id)
+            for phrase in subscription.phrases:
+                self.by_phrase[position[normalize(phrase)]].add(
+                    subscription.id)
+
+    def match(self, record):
+        # Ids of the subscriptions the record belongs to
+        text = ' '.join(record[field] or '' for field in
+                        ('title', 'summary', 'arxiv_comment'))
+        found = set(self.without_phrases)
+        for index in self.phrases.find(text):
+            found |= self.by_phrase[index]
+
+        terms = set(record['tags']['term'])
+        return {id for id in found
+                if not self.categories[id] or self.categories[id] & terms}
+
+
+def tag_subscriptions(connection, matches, batch_size=UPSERT_BATCH):
+    # matches maps paper id to its subscription ids. Earlier tags of those
+    # papers are replaced, since a new version may match differently.
+    if not matches:
+        return
+
+    connection.execute(
+        delete(paper_subscription_table).where(
+            paper_subscription_table.c.paper_id ==
+            any_(bindparam('ids', type_=ARRAY(String)))),
+        ids=list(matches))
+    rows = [{'paper_id': paper_id, 'subscription_id': subscription_id}
+            for paper_id, subscription_ids in matches.items()
+            for subscription_id in sorted(subscription_ids)]
+    for batch in chunked(rows, batch_size):
+        connection.execute(insert(paper_subscription_table).values(batch))
+
+
+def retag(connection, matcher):
+    # Re-matches every stored paper, for subscriptions added after their
+    # papers were collected
+    papers = iter_papers(engine, ['id', 'title', 'summary', 'arxiv_comment',
+                                  'tags'], page_size=EXPORT_PAGE_SIZE)
+    rows = [(paper['id'], subscription_id) for paper in papers
+            for subscription_id in sorted(matcher.match(paper))]
+
+    connection.execute(delete(paper_subscription_table))
+    copy_rows(connection, paper_subscription_table.name,
+              ['paper_id', 'subscription_id'], rows)
+    return len(rows)
+
+
+def papers_for_subscription(connection, name, limit=50):
+    joined = paper_subscription_table.join(
+        subscription_table,
+        paper_subscription_table.c.subscription_id == subscription_table.c.id
+    ).join(paper_table,
+           paper_subscription_table.c.paper_id == paper_table.c.id)
+    stmt = select([paper_table.c[column] for column in LISTED_COLUMNS]) \
+        .select_from(joined) \
+        .where(subscription_table.c.name == name) \
+        .order_by(paper_table.c.updated_datetime.desc()) \
+        .limit(limit)
+
+    return [dict(row) for row in connection.execute(stmt)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Tag every stored paper with its subscriptions.')
+    parser.parse_args()
+
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        subscriptions = load_subscriptions(connection)
+        tags = retag(connection, SubscriptionMatcher(subscriptions))
+    print(f"{tags} tags for {len(subscriptions)} subscriptions in "
+          f"{time.perf_counter() - start:.2f}s")
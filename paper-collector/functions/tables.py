@@ -1,4 +1,6 @@
 from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import BigInteger, SmallInteger, Index, Float, LargeBinary
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy import create_engine, MetaData, Table, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -6,15 +8,20 @@ from constants import *
 from sqlalchemy.engine.url import URL
 
 
+# Created once per warm instance and shared by every invocation after it.
+# Idle connections can be dropped between scheduled runs, hence the ping.
 engine = create_engine(URL(
     drivername='postgres+psycopg2',
     username=SQL_USER,
     password=SQL_PWD,
     database=SQL_DB,
-    query={'host': SQL_HOST}))
+    query={'host': SQL_HOST}),
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=POOL_RECYCLE)
 
 Base = declarative_base()
-Base.metadata.create_all(bind=engine)
 
 
 class PaperTable(Base):
@@ -30,6 +37,14 @@ class PaperTable(Base):
     tags = Column(JSON)
     published_datetime = Column(DateTime)
     updated_datetime = Column(DateTime)
+    # Weighted title / summary / comment document, kept by the writers
+    search_vector = Column(TSVECTOR)
+    __table_args__ = (Index('ix_papertable_search_vector', 'search_vector',
+                            postgresql_using='gin'),
+                      Index('ix_papertable_updated_id',
+                            'updated_datetime', 'id'),
+                      Index('ix_papertable_published_datetime',
+                            'published_datetime'))
 
 
 class AuthorTable(Base):
@@ -37,3 +52,130 @@ class AuthorTable(Base):
     id = Column(String, primary_key=True)
     author = Column(String, nullable=False)
     paper_id = Column(String, ForeignKey('PaperTable.id'))
+
+
+class AuthorDimTable(Base):
+    # One row per distinct author, keyed by a hash of the normalized name
+    __tablename__ = 'authors'
+    id = Column(BigInteger, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+class PaperAuthorTable(Base):
+    __tablename__ = 'paper_authors'
+    paper_id = Column(String, ForeignKey('PaperTable.id'), primary_key=True)
+    position = Column(SmallInteger, primary_key=True)
+    author_id = Column(BigInteger, ForeignKey('authors.id'), nullable=False)
+    __table_args__ = (Index('ix_paper_authors_author_id', 'author_id'),)
+
+
+class PaperCategoryTable(Base):
+    # One row per (paper, tag term). updated_datetime is copied from the
+    # paper so category-scoped recency queries stay on the index.
+    __tablename__ = 'paper_categories'
+    paper_id = Column(String, ForeignKey('PaperTable.id'), primary_key=True)
+    category = Column(String, primary_key=True)
+    updated_datetime = Column(DateTime)
+    __table_args__ = (Index('ix_paper_categories_category_updated',
+                            'category', 'updated_datetime'),)
+
+
+class FeatureTable(Base):
+    # Derived from citations: papers cited by and papers citing each id
+    __tablename__ = 'features'
+    id = Column(String, primary_key=True)
+    num_cite = Column(Integer)
+    num_cited_by = Column(Integer)
+
+
+class CitationTable(Base):
+    # Ids on either side need not be in PaperTable. source tells edges
+    # imported from a references dump from ones read out of metadata.
+    __tablename__ = 'citations'
+    citing_id = Column(String, primary_key=True)
+    cited_id = Column(String, primary_key=True)
+    source = Column(String, nullable=False)
+    __table_args__ = (Index('ix_citations_cited_id', 'cited_id'),)
+
+
+class PaperSignatureTable(Base):
+    # MinHash signature of title and summary shingles, as little-endian
+    # uint32 values
+    __tablename__ = 'paper_minhash'
+    paper_id = Column(String, ForeignKey('PaperTable.id'), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+
+class LshBandTable(Base):
+    # Papers whose signatures agree on every row of a band share a bucket.
+    # Rows go with their paper_minhash row, so paper_id carries no foreign
+    # key to check on every one of the BANDS rows a paper writes.
+    __tablename__ = 'lsh_bands'
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    paper_id = Column(String, primary_key=True)
+    __table_args__ = (Index('ix_lsh_bands_paper_id', 'paper_id'),)
+
+
+class PaperDuplicateTable(Base):
+    # Candidate duplicate pairs, stored once with paper_id < duplicate_id
+    __tablename__ = 'paper_duplicates'
+    paper_id = Column(String, ForeignKey('PaperTable.id'), primary_key=True)
+    duplicate_id = Column(String, ForeignKey('PaperTable.id'),
+                          primary_key=True)
+    similarity = Column(Float, nullable=False)
+    __table_args__ = (Index('ix_paper_duplicates_duplicate_id',
+                            'duplicate_id'),)
+
+
+class PaperVersionTable(Base):
+    # Every version of a paper seen by ingest. A summary is either a
+    # keyframe (base_version is null) or a word-level delta against the
+    # base_version row; both are zlib-compressed. chain counts the deltas
+    # since the last keyframe. No foreign key: history is written before
+    # the paper row it describes.
+    __tablename__ = 'paper_versions'
+    paper_id = Column(String, primary_key=True)
+    version = Column(Integer, primary_key=True)
+    title = Column(String)
+    arxiv_comment = Column(String)
+    updated_datetime = Column(DateTime)
+    base_version = Column(Integer)
+    chain = Column(SmallInteger, nullable=False)
+    summary_data = Column(LargeBinary, nullable=False)
+    summary_length = Column(Integer, nullable=False)
+
+
+class SubscriptionTable(Base):
+    # A topic filter: papers with any of the phrases in title, summary or
+    # comment and any of the categories. Empty lists match everything.
+    __tablename__ = 'subscriptions'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    phrases = Column(JSON, nullable=False)
+    categories = Column(JSON, nullable=False)
+    created_at = Column(DateTime)
+
+
+class PaperSubscriptionTable(Base):
+    __tablename__ = 'paper_subscriptions'
+    paper_id = Column(String, ForeignKey('PaperTable.id'), primary_key=True)
+    subscription_id = Column(Integer, ForeignKey('subscriptions.id'),
+                             primary_key=True)
+    __table_args__ = (Index('ix_paper_subscriptions_subscription_id',
+                            'subscription_id'),)
+
+
+class IngestStateTable(Base):
+    __tablename__ = 'ingest_state'
+    search_query = Column(String, primary_key=True)
+    # Stop bound of the current run and the newest update written so far
+    watermark = Column(DateTime)
+    high_watermark = Column(DateTime)
+    page_offset = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    updated_at = Column(DateTime)
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine)
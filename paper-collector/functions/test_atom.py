@@ -0,0 +1,65 @@
+import os
+from datetime import datetime
+import pytest
+from atom import parse_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'fixtures', 'atom')
+
+
+def parse_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as feed:
+        return parse_page(feed.read())
+
+
+def test_entries_become_rows():
+    count, rows = parse_fixture('page-authors.xml')
+
+    assert count == 3
+    assert [(row.id, row.version) for row in rows] == \
+        [('2005.06201', 2), ('2005.05873', 1), ('2005.04410', 3)]
+    assert [row.tags['term'] for row in rows] == \
+        [['cs.LG', 'cs.CL', 'stat.ML'], ['stat.ML'], ['cs.DC', 'cs.LG']]
+    assert rows[0].published_datetime == datetime(2020, 5, 12, 8, 14, 31)
+    assert rows[0].updated_datetime == datetime(2020, 5, 13, 17, 59, 58)
+
+
+def test_author_is_the_last_author_like_feedparser():
+    _, rows = parse_fixture('page-authors.xml')
+
+    assert [row.author for row in rows] == \
+        ['Anna Kowalska', 'Lars Eriksson', 'Sophie Müller']
+    assert rows[0].authors == ['Maria Oliveira', 'Kenji Watanabe',
+                               'Anna Kowalska']
+    assert len(rows[2].authors) == 5
+
+
+def test_text_fields_are_trimmed_and_unescaped():
+    _, rows = parse_fixture('page-authors.xml')
+
+    assert rows[0].title.startswith('Sparse Attention')
+    assert rows[0].title.endswith('Fixed Compute Budgets')
+    assert rows[0].summary.startswith('We study')
+    assert '&amp;' not in rows[2].summary and ' & ' in rows[2].summary
+    assert rows[1].arxiv_comment is None
+    assert rows[2].arxiv_comment.startswith('Accepted at a workshop')
+
+
+def test_duplicate_and_old_style_ids_are_dropped():
+    count, rows = parse_fixture('page-duplicates.xml')
+
+    # Every entry counts towards the page offset, kept or not
+    assert count == 3
+    assert [(row.id, row.version, row.author) for row in rows] == \
+        [('1812.01187', 4, 'Diego Alvarez')]
+
+
+def test_error_entry_yields_no_rows():
+    assert parse_fixture('page-error.xml') == (1, [])
+
+
+@pytest.mark.parametrize('name', sorted(os.listdir(FIXTURES)))
+def test_every_fixture_parses(name):
+    count, rows = parse_fixture(name)
+    assert count >= len(rows)
+    assert len({row.id for row in rows}) == len(rows)
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+import fetch
+
+NEWEST = datetime(2020, 5, 1)
+
+
+def entry(i):
+    # Newest first, one minute apart, the way lastUpdatedDate sorts
+    updated = f"{NEWEST - timedelta(minutes=i):%Y-%m-%dT%H:%M:%SZ}"
+    return {'id': f'http://arxiv.org/abs/2005.{i:05d}v1',
+            'title': f'Paper {i}', 'summary': '', 'author': 'A', 'authors': ['A'],
+            'arxiv_comment': None, 'tags': [{'term': 'cs.LG'}],
+            'published': updated, 'updated': updated}
+
+
+def updated(i):
+    return NEWEST - timedelta(minutes=i)
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    # fetch_page serves slices of an in-memory listing and logs each call
+    listing = []
+    calls = []
+
+    def fetch_page(search_query, start, page_size, conditional=False):
+        calls.append((start, page_size, conditional))
+        return json.dumps(listing[start:start + page_size]).encode('utf-8')
+
+    monkeypatch.setattr(fetch, 'INGEST_PATH', 'slim')
+    monkeypatch.setattr(fetch, 'fetch_page', fetch_page)
+
+    def serve(count):
+        listing[:] = [entry(i) for i in range(count)]
+        return calls
+    return serve
+
+
+def pages(watermark=None, start=0, max_results=10):
+    return [(offset, [record['id'] for record in records], complete)
+            for offset, records, complete in
+            fetch.iter_pages('q', watermark, start=start, page_size=2,
+                             max_results=max_results)]
+
+
+def test_without_watermark_reads_to_the_end(feed):
+    feed(5)
+    assert pages() == [(2, ['2005.00000', '2005.00001'], False),
+                       (4, ['2005.00002', '2005.00003'], False),
+                       (5, ['2005.00004'], True)]
+
+
+def test_without_watermark_an_empty_page_completes(feed):
+    feed(4)
+    assert pages()[-1] == (4, [], True)
+
+
+def test_without_watermark_max_results_completes(feed):
+    feed(10)
+    assert pages(max_results=4) == [(2, ['2005.00000', '2005.00001'], False),
+                                    (4, ['2005.00002', '2005.00003'], True)]
+
+
+def test_stops_at_the_watermark(feed):
+    calls = feed(10)
+    assert pages(updated(2)) == [(2, ['2005.00000', '2005.00001'], False),
+                                 (4, ['2005.00002'], True)]
+    assert [call[2] for call in calls] == [True, False]
+
+
+def test_capped_incremental_run_is_not_complete(feed):
+    feed(10)
+    assert pages(updated(8), max_results=4) == \
+        [(2, ['2005.00000', '2005.00001'], False),
+         (4, ['2005.00002', '2005.00003'], False)]
+
+
+def test_resumed_run_carries_on_from_its_offset(feed):
+    calls = feed(10)
+    assert pages(updated(8), start=4, max_results=4) == \
+        [(6, ['2005.00004', '2005.00005'], False),
+         (8, ['2005.00006', '2005.00007'], False)]
+    assert pages(updated(8), start=8, max_results=4) == \
+        [(10, ['2005.00008'], True)]
+    # Only the top of the listing is fetched conditionally
+    assert not any(call[2] for call in calls)
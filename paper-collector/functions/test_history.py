@@ -0,0 +1,90 @@
+import random
+from collections import namedtuple
+from datetime import datetime
+from history import version_row, rebuild_summaries, make_delta, \
+    apply_delta, KEYFRAME_INTERVAL
+
+Row = namedtuple('Row', 'version base_version chain summary_data')
+
+WORDS = ('we propose a novel method for sparse attention in neural '
+         'networks and show that it improves accuracy').split()
+
+
+def paper(version, summary):
+    return {'id': '2005.00001', 'version': version, 'title': 'Title',
+            'summary': summary, 'arxiv_comment': None,
+            'updated_datetime': datetime(2020, 5, version % 28 + 1)}
+
+
+def revisions(count, seed=0):
+    # Each version edits a few words of the last and keeps odd whitespace:
+    # runs of spaces, tabs, newlines and leading and trailing blanks
+    rng = random.Random(seed)
+    words = rng.choices(WORDS, k=120)
+    separators = [rng.choice([' ', ' ', '  ', '\n', '\t ', ' \n\n '])
+                  for _ in words]
+    summaries = []
+    for _ in range(count):
+        for _ in range(3):
+            words[rng.randrange(len(words))] = rng.choice(WORDS + ['é∑'])
+        summaries.append('  ' + ''.join(word + separator for word, separator
+                                        in zip(words, separators)) + '\n')
+    return summaries
+
+
+def chain(summaries):
+    # The bases record_versions hands to version_row for consecutive
+    # versions of one paper
+    rows = []
+    base = None
+    for version, summary in enumerate(summaries, 1):
+        row = version_row(paper(version, summary), base)
+        rows.append(Row(row['version'], row['base_version'], row['chain'],
+                        row['summary_data']))
+        base = (version, summary, row['chain'] + 1)
+    return rows
+
+
+def test_delta_round_trips_whitespace():
+    base = 'a  b\tc\n\nd '
+    summary = ' a  b\tX\n\nd  e'
+    assert apply_delta(base, make_delta(base, summary)) == summary
+
+
+def test_rebuild_returns_every_version_exactly():
+    summaries = revisions(3 * KEYFRAME_INTERVAL + 2)
+    rows = chain(summaries)
+
+    assert any(row.base_version is not None for row in rows)
+    assert rebuild_summaries(rows) == dict(enumerate(summaries, 1))
+
+
+def test_keyframes_bound_every_chain():
+    rows = chain(revisions(3 * KEYFRAME_INTERVAL + 2, seed=1))
+
+    assert rows[0].base_version is None
+    assert max(row.chain for row in rows) < KEYFRAME_INTERVAL
+    assert sum(row.base_version is None for row in rows) >= 3
+    for row in rows:
+        if row.base_version is not None:
+            assert row.base_version == row.version - 1
+            assert row.chain == rows[row.version - 2].chain + 1
+
+
+def test_chain_suffix_is_enough_to_rebuild_a_version():
+    # summary_at reads only the last chain + 1 rows up to a version
+    summaries = revisions(2 * KEYFRAME_INTERVAL + 3, seed=2)
+    rows = chain(summaries)
+
+    for row in rows:
+        suffix = rows[row.version - 1 - row.chain:row.version]
+        assert suffix[0].base_version is None
+        assert rebuild_summaries(suffix)[row.version] == \
+            summaries[row.version - 1]
+
+
+def test_missing_and_rewritten_summaries():
+    summaries = ['', 'A new abstract.', 'Completely different text here.']
+    rows = chain(summaries)
+    assert rebuild_summaries(rows) == dict(enumerate(summaries, 1))
+    assert version_row(paper(1, None))['summary_length'] == 0
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from matcher import PhraseMatcher, normalize
+from subscriptions import SubscriptionMatcher, union_query, shard_queries
+
+Subscription = namedtuple('Subscription', 'id phrases categories')
+
+DEEP_LEARNING = Subscription(1, ['deep learning', 'neural network', 'GPU'],
+                             ['cs.LG', 'cs.CV'])
+KERNELS = Subscription(2, ['kernel methods'], ['stat.ML'])
+
+
+def record(title, summary='', comment=None, terms=('cs.LG',)):
+    return {'title': title, 'summary': summary, 'arxiv_comment': comment,
+            'tags': {'term': list(terms)}}
+
+
+def test_normalize_splits_on_hyphens_and_punctuation():
+    assert normalize('Deep-Learning-based  Models') == \
+        'deep learning based models'
+    assert normalize('Neural-network: surrogates (GPU/CPU)') == \
+        'neural network surrogates gpu cpu'
+    assert normalize(None) == ''
+
+
+def test_phrase_matcher_finds_every_phrase_in_one_pass():
+    matcher = PhraseMatcher(['deep learning', 'learning rate', 'gpu'])
+    assert matcher.find('Tuning the learning rate of deep learning on GPUs') \
+        == {0, 1, 2}
+
+
+def test_phrase_matcher_needs_a_word_boundary_at_the_start():
+    matcher = PhraseMatcher(['gpu', 'neural network'])
+    assert matcher.find('A multi-GPU trainer') == {0}
+    assert matcher.find('Neural networks') == {1}
+    assert matcher.find('eGPUs and neuralnetwork') == set()
+
+
+def test_phrase_matcher_overlapping_phrases():
+    matcher = PhraseMatcher(['network', 'neural network', 'neural'])
+    assert matcher.find('a neural network') == {0, 1, 2}
+
+
+def test_hyphenated_titles_match_like_arxiv_search():
+    matcher = SubscriptionMatcher([DEEP_LEARNING])
+    assert matcher.match(record('A deep-learning-based segmenter')) == {1}
+    assert matcher.match(record('Neural-network surrogates for CFD')) == {1}
+    assert matcher.match(record('Multi-GPU training', terms=['cs.CV'])) == {1}
+
+
+def test_subscription_matcher_checks_categories():
+    matcher = SubscriptionMatcher([DEEP_LEARNING, KERNELS])
+    assert matcher.match(record('Kernel methods', terms=['stat.ML'])) == {2}
+    assert matcher.match(record('Kernel methods', terms=['cs.LG'])) == set()
+    assert matcher.match(record('Title', 'Deep learning with kernel-methods',
+                                terms=['stat.ML', 'cs.LG'])) == {1, 2}
+
+
+def test_subscription_matcher_reads_the_comment():
+    matcher = SubscriptionMatcher([DEEP_LEARNING])
+    assert matcher.match(record('Untitled', comment='Code runs on a GPU.')) \
+        == {1}
+
+
+def test_subscription_without_phrases_takes_its_categories():
+    matcher = SubscriptionMatcher([Subscription(3, [], ['cs.DC'])])
+    assert matcher.match(record('Anything', terms=['cs.DC'])) == {3}
+    assert matcher.match(record('Anything', terms=['cs.LG'])) == set()
+
+
+def test_shards_cover_every_category():
+    assert shard_queries([DEEP_LEARNING, KERNELS]) == \
+        [union_query([DEEP_LEARNING, KERNELS], item)
+         for item in ['cs.CV', 'cs.LG', 'stat.ML']]
+
+
+def test_uncategorized_subscription_is_not_sharded_away():
+    folding = Subscription(3, ['protein folding'], [])
+    queries = shard_queries([DEEP_LEARNING, folding])
+
+    assert queries == [union_query([DEEP_LEARNING, folding])]
+    assert 'cat:' not in queries[0]
+    assert '%22protein folding%22' in queries[0]
@@ -0,0 +1,61 @@
+from search import SqliteSearchEngine
+
+
+def paper(id, title, summary, comment=None):
+    return {'id': id, 'title': title, 'summary': summary,
+            'arxiv_comment': comment}
+
+
+def test_sqlite_engine_ranks_title_matches_first():
+    engine = SqliteSearchEngine()
+    engine.index([
+        paper('2001.00001', 'Graph kernels', 'Neural networks on graphs.'),
+        paper('2001.00002', 'Neural networks for graphs', 'Kernel methods.'),
+        paper('2001.00003', 'Sparse coding', 'Dictionary learning.',
+              'neural networks appendix')])
+
+    results = engine.search('neural networks', 10)
+
+    assert [result['id'] for result in results] == \
+        ['2001.00002', '2001.00001', '2001.00003']
+    assert '<b>Neural</b>' in results[0]['title_highlight']
+
+
+def test_sqlite_engine_paginates():
+    engine = SqliteSearchEngine()
+    engine.index([paper(f'2001.{i:05d}', f'attention {i}', '')
+                  for i in range(5)])
+
+    first = engine.search('attention', 2)
+    second = engine.search('attention', 2, offset=2)
+
+    assert len(first) == len(second) == 2
+    assert not {result['id'] for result in first} & \
+        {result['id'] for result in second}
+
+
+def test_sqlite_engine_replaces_reindexed_papers():
+    engine = SqliteSearchEngine()
+    engine.index([paper('2001.00001', 'Old title', 'convolution')])
+    engine.index([paper('2001.00001', 'New title', 'attention')])
+
+    assert engine.search('convolution', 10) == []
+    assert [result['id'] for result in engine.search('attention', 10)] == \
+        ['2001.00001']
+
+
+def test_sqlite_engine_persists_to_file(tmp_path):
+    path = str(tmp_path / 'search.sqlite3')
+    SqliteSearchEngine(path).index([paper('2001.00001', 'Perceptron', '')])
+
+    assert [result['id'] for result in
+            SqliteSearchEngine(path).search('perceptron', 10)] == \
+        ['2001.00001']
+
+
+def test_sqlite_engine_quotes_user_input():
+    engine = SqliteSearchEngine()
+    engine.index([paper('2001.00001', 'Deep learning', '')])
+
+    assert engine.search('deep" OR', 10) == []
+    assert engine.search('   ', 10) == []
@@ -0,0 +1,77 @@
+import pandas as pd
+
+ARXIV_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+RECORD_COLUMNS = ['unique_id', 'version_number', 'author', 'title',
+                  'summary', 'arxiv_comment', 'authors', 'category_tags',
+                  'published_datetime', 'updated_datetime']
+
+
+def extract_category(tags):
+    # One row per (article, tag), then back to one term list per article
+    tags = tags.reset_index(drop=True)
+    terms = tags.explode().dropna().str.get('term')
+    grouped = terms.groupby(level=0).agg(list).reindex(tags.index)
+
+    return [{'term': term_list if isinstance(term_list, list) else []}
+            for term_list in grouped]
+
+
+def extract_column(df_file):
+    df_file = df_file.reset_index(drop=True)
+
+    final_df = pd.DataFrame({
+        'unique_id': df_file['id'].str.extract(
+            r'(\d\d\d\d\.\d\d\d\d\d)', expand=False),
+        # Whole version suffix, so v10 and later are not read as v0
+        'version_number': df_file['id'].str.extract(
+            r'v(\d+)$', expand=False),
+        'author': df_file['author'],
+        'title': df_file['title'],
+        'summary': df_file['summary'],
+        'arxiv_comment': df_file['arxiv_comment'],
+        'authors': df_file['authors'],
+        'category_tags': extract_category(df_file['tags']),
+        'published_datetime': pd.to_datetime(df_file['published'],
+                                             format=ARXIV_TIME_FORMAT),
+        'updated_datetime': pd.to_datetime(df_file['updated'],
+                                           format=ARXIV_TIME_FORMAT)},
+        columns=RECORD_COLUMNS)
+
+    final_df = final_df.drop_duplicates(subset='unique_id',
+                                        keep='first', inplace=False)
+
+    final_df = final_df.dropna(subset=['unique_id'], inplace=False)
+
+    return final_df
+
+
+def article_records(article_df):
+    # Missing comments come through as NaN, which Postgres would
+    # otherwise store as the string 'NaN'
+    comments = article_df['arxiv_comment'].astype(object)
+    comments = comments.where(comments.notnull(), None)
+
+    columns = zip(article_df['unique_id'].values,
+                  article_df['version_number'].astype(int).values,
+                  article_df['author'].values,
+                  article_df['title'].values,
+                  article_df['summary'].values,
+                  comments.values,
+                  article_df['category_tags'].values,
+                  article_df['published_datetime'].dt.to_pydatetime(),
+                  article_df['updated_datetime'].dt.to_pydatetime(),
+                  article_df['authors'].values)
+
+    return [{'id': unique_id,
+             'version': int(version),
+             'author': author,
+             'title': title,
+             'summary': summary,
+             'arxiv_comment': comment,
+             'tags': tags,
+             'published_datetime': published,
+             'updated_datetime': updated,
+             'authors': authors}
+            for (unique_id, version, author, title, summary, comment, tags,
+                 published, updated, authors) in columns]
@@ -0,0 +1,89 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class Transport:
+    # Keep-alive HTTP sessions (one per fetching thread) that ask for gzip
+    # and can revalidate a URL with the ETag / Last-Modified it last had
+    def __init__(self, timeout, validators_path=None):
+        self.timeout = timeout
+        self.validators_path = validators_path
+        self.validators = {}
+        self.pending = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0,
+                      'bytes': 0, 'seconds': 0.0}
+
+        if validators_path and os.path.exists(validators_path):
+            with open(validators_path) as f:
+                self.validators = json.load(f)
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            import requests
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def get(self, url, conditional=False):
+        # Returns the decoded body, or None when the server answers 304
+        headers = {'Accept-Encoding': 'gzip'}
+        if conditional and url in self.validators:
+            etag, last_modified = self.validators[url]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        start = time.perf_counter()
+        response = self.session().get(url, headers=headers,
+                                      timeout=self.timeout, stream=True)
+        # Read the body as sent, so the byte counter sees compressed sizes
+        body = response.raw.read(decode_content=False)
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += len(body)
+            self.stats['seconds'] += elapsed
+            if response.status_code == 304:
+                self.stats['not_modified'] += 1
+
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            with self.lock:
+                self.pending[url] = [etag, last_modified]
+
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def save(self):
+        # Validators only count once the run that fetched them finished,
+        # otherwise a crashed run's first page would read as unchanged
+        with self.lock:
+            self.validators.update(self.pending)
+            self.pending = {}
+            if self.validators_path:
+                os.makedirs(os.path.dirname(self.validators_path),
+                            exist_ok=True)
+                with open(self.validators_path, 'w') as f:
+                    json.dump(self.validators, f)
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+        latency = stats['seconds'] / stats['requests'] \
+            if stats['requests'] else 0.0
+        return (f"{stats['requests']} requests "
+                f"({stats['not_modified']} not modified), "
+                f"{stats['bytes'] / 1024:.0f} KiB transferred, "
+                f"{latency:.2f}s mean latency")
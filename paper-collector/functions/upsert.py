@@ -0,0 +1,131 @@
+from sqlalchemy import literal_column, delete, any_, bindparam, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from constants import *
+from tables import PaperTable, AuthorTable, AuthorDimTable, \
+    PaperAuthorTable, PaperCategoryTable
+from authors import author_key
+from search import refresh_search_vectors
+
+paper_table = PaperTable.__table__
+author_table = AuthorTable.__table__
+author_dim_table = AuthorDimTable.__table__
+paper_author_table = PaperAuthorTable.__table__
+paper_category_table = PaperCategoryTable.__table__
+
+PAPER_COLUMNS = ['id', 'version', 'author', 'title', 'summary',
+                 'arxiv_comment', 'tags', 'published_datetime',
+                 'updated_datetime']
+
+
+def chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def upsert_papers(connection, records):
+    rows = [{column: record[column] for column in PAPER_COLUMNS}
+            for record in records]
+    stmt = insert(paper_table).values(rows)
+
+    # Rows whose stored version is not older are left untouched and are
+    # not returned, so they count as neither an insert nor an update.
+    # REWRITE also lets a row replace the same version.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[paper_table.c.id],
+        set_={column: stmt.excluded[column] for column in PAPER_COLUMNS[1:]},
+        where=stmt.excluded.version >= paper_table.c.version if REWRITE
+        else stmt.excluded.version > paper_table.c.version)
+
+    # xmax is only zero on a freshly inserted tuple
+    stmt = stmt.returning(paper_table.c.id,
+                          literal_column('(xmax = 0)').label('inserted'))
+
+    return connection.execute(stmt).fetchall()
+
+
+def delete_for_papers(connection, table, records):
+    connection.execute(
+        delete(table).where(
+            table.c.paper_id == any_(bindparam('ids', type_=ARRAY(String)))),
+        ids=[record['id'] for record in records])
+
+
+def upsert_authors(connection, records):
+    rows = []
+    for record in records:
+        for i, name in enumerate(record['authors']):
+            rows.append({'id': record['id'] + "-" + str(i),
+                         'author': name,
+                         'paper_id': record['id']})
+    if not rows:
+        return
+
+    # Drop positions a new version no longer has before rewriting the rest
+    delete_for_papers(connection, author_table, records)
+    connection.execute(insert(author_table).values(rows))
+
+
+def write_author_links(connection, records, batch_size=UPSERT_BATCH):
+    if not records:
+        return
+
+    # Names are interned per batch, so each distinct author is sent once
+    # however many of the batch's papers they are on
+    names = {}
+    links = []
+    for record in records:
+        for position, name in enumerate(record['authors']):
+            key = author_key(name)
+            names.setdefault(key, name)
+            links.append({'paper_id': record['id'],
+                          'position': position,
+                          'author_id': key})
+
+    for batch in chunked([{'id': key, 'name': name}
+                          for key, name in names.items()], batch_size):
+        stmt = insert(author_dim_table).values(batch)
+        connection.execute(stmt.on_conflict_do_nothing(
+            index_elements=[author_dim_table.c.id]))
+
+    # A new version may reorder or change its authors, so the links of
+    # every written paper are replaced rather than merged
+    delete_for_papers(connection, paper_author_table, records)
+    for batch in chunked(links, batch_size):
+        connection.execute(insert(paper_author_table).values(batch))
+
+
+def write_categories(connection, records, batch_size=UPSERT_BATCH):
+    if not records:
+        return
+
+    rows = [{'paper_id': record['id'],
+             'category': category,
+             'updated_datetime': record['updated_datetime']}
+            for record in records
+            for category in dict.fromkeys(record['tags']['term'])]
+
+    delete_for_papers(connection, paper_category_table, records)
+    for batch in chunked(rows, batch_size):
+        connection.execute(insert(paper_category_table).values(batch))
+
+
+def upsert_articles(connection, records, batch_size=UPSERT_BATCH):
+    count_insert = 0
+    count_update = 0
+
+    for batch in chunked(records, batch_size):
+        written = upsert_papers(connection, batch)
+        written_ids = {row.id for row in written}
+
+        inserted = sum(1 for row in written if row.inserted)
+        count_insert += inserted
+        count_update += len(written) - inserted
+
+        changed = [record for record in batch
+                   if record['id'] in written_ids]
+        upsert_authors(connection, changed)
+        write_author_links(connection, changed)
+        write_categories(connection, changed)
+        refresh_search_vectors(connection, written_ids)
+
+    return count_insert, count_update
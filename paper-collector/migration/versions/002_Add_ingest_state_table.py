@@ -0,0 +1,21 @@
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData
+from migrate import *
+
+meta = MetaData()
+
+ingest_state = Table('ingest_state', meta,
+    Column('search_query', String, primary_key=True),
+    Column('watermark', DateTime),
+    Column('high_watermark', DateTime),
+    Column('page_offset', Integer, nullable=False),
+    Column('status', String, nullable=False),
+    Column('updated_at', DateTime))
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    ingest_state.create()
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    ingest_state.drop()
@@ -0,0 +1,50 @@
+from sqlalchemy import Table, Column, String, BigInteger, SmallInteger
+from sqlalchemy import MetaData, ForeignKey
+from migrate import *
+
+meta = MetaData()
+
+paper_table = Table('PaperTable', meta, Column('id', String, primary_key=True))
+
+authors = Table('authors', meta,
+    Column('id', BigInteger, primary_key=True),
+    Column('name', String, nullable=False))
+
+paper_authors = Table('paper_authors', meta,
+    Column('paper_id', String, ForeignKey('PaperTable.id'), primary_key=True),
+    Column('position', SmallInteger, primary_key=True),
+    Column('author_id', BigInteger, ForeignKey('authors.id'), nullable=False))
+
+# Same key as authors.author_key in functions/: the first 8 bytes of the
+# md5 of the whitespace-collapsed, lower-cased name as a signed bigint
+AUTHOR_KEY = """('x' || substr(md5(lower(btrim(regexp_replace(author,
+    '\\s+', ' ', 'g')))), 1, 16))::bit(64)::bigint"""
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    authors.create()
+    paper_authors.create()
+
+    # Backfill from the per-authorship rows; positions come from the
+    # "<paper_id>-<i>" keys of AuthorTable
+    migrate_engine.execute(f"""
+        INSERT INTO authors (id, name)
+        SELECT DISTINCT ON (key) key, author
+        FROM (SELECT {AUTHOR_KEY} AS key, author FROM "AuthorTable") named
+        ORDER BY key""")
+    migrate_engine.execute(f"""
+        INSERT INTO paper_authors (paper_id, position, author_id)
+        SELECT paper_id, substring(id from '-(\\d+)$')::smallint, {AUTHOR_KEY}
+        FROM "AuthorTable"
+        WHERE paper_id IS NOT NULL""")
+
+    # Built after the backfill rather than maintained during it
+    migrate_engine.execute('CREATE INDEX ix_paper_authors_author_id '
+                           'ON paper_authors (author_id)')
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_authors.drop()
+    authors.drop()
@@ -0,0 +1,32 @@
+from migrate import *
+
+# Kept in step with search.SEARCH_DOCUMENT in functions/
+SEARCH_DOCUMENT = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(arxiv_comment, '')), 'C')"""
+
+BATCH_SIZE = 5000
+
+
+def upgrade(migrate_engine):
+    migrate_engine.execute(
+        'ALTER TABLE "PaperTable" ADD COLUMN search_vector tsvector')
+
+    # Backfilled in batches so no single statement holds the table long
+    while True:
+        result = migrate_engine.execute(f"""
+            UPDATE "PaperTable" SET search_vector = {SEARCH_DOCUMENT}
+            WHERE id IN (SELECT id FROM "PaperTable"
+                         WHERE search_vector IS NULL
+                         LIMIT {BATCH_SIZE})""")
+        if result.rowcount == 0:
+            break
+
+    migrate_engine.execute('CREATE INDEX ix_papertable_search_vector '
+                           'ON "PaperTable" USING gin (search_vector)')
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute(
+        'ALTER TABLE "PaperTable" DROP COLUMN search_vector')
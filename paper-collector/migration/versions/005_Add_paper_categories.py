@@ -0,0 +1,49 @@
+from sqlalchemy import Table, Column, String, DateTime, MetaData, ForeignKey
+from sqlalchemy import text
+from migrate import *
+
+meta = MetaData()
+
+paper_table = Table('PaperTable', meta, Column('id', String, primary_key=True))
+
+paper_categories = Table('paper_categories', meta,
+    Column('paper_id', String, ForeignKey('PaperTable.id'), primary_key=True),
+    Column('category', String, primary_key=True),
+    Column('updated_datetime', DateTime))
+
+BATCH_SIZE = 5000
+
+# Papers are taken in id order, BATCH_SIZE at a time, and their
+# {'term': [...]} tags unpacked into one row per term
+NEXT_BATCH = text("""
+    SELECT max(id) FROM (SELECT id FROM "PaperTable" WHERE id > :last
+                         ORDER BY id LIMIT :size) batch""")
+
+BACKFILL = text("""
+    INSERT INTO paper_categories (paper_id, category, updated_datetime)
+    SELECT DISTINCT p.id, term, p.updated_datetime
+    FROM "PaperTable" p, json_array_elements_text(p.tags -> 'term') term
+    WHERE p.id > :last AND p.id <= :upto""")
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_categories.create()
+
+    last = ''
+    while True:
+        upto = migrate_engine.execute(NEXT_BATCH, last=last,
+                                      size=BATCH_SIZE).scalar()
+        if upto is None:
+            break
+        migrate_engine.execute(BACKFILL, last=last, upto=upto)
+        last = upto
+
+    migrate_engine.execute(
+        'CREATE INDEX ix_paper_categories_category_updated '
+        'ON paper_categories (category, updated_datetime)')
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_categories.drop()
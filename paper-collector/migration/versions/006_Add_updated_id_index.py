@@ -0,0 +1,11 @@
+from migrate import *
+
+
+def upgrade(migrate_engine):
+    # Backs keyset pagination on (updated_datetime, id)
+    migrate_engine.execute('CREATE INDEX ix_papertable_updated_id '
+                           'ON "PaperTable" (updated_datetime, id)')
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute('DROP INDEX ix_papertable_updated_id')
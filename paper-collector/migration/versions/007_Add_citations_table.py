@@ -0,0 +1,21 @@
+from sqlalchemy import Table, Column, String, MetaData
+from migrate import *
+
+meta = MetaData()
+
+citations = Table('citations', meta,
+    Column('citing_id', String, primary_key=True),
+    Column('cited_id', String, primary_key=True),
+    Column('source', String, nullable=False))
+
+
+def upgrade(migrate_engine):
+    meta.bind = migrate_engine
+    citations.create()
+    migrate_engine.execute('CREATE INDEX ix_citations_cited_id '
+                           'ON citations (cited_id)')
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    citations.drop()
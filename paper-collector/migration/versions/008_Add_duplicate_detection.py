@@ -0,0 +1,41 @@
+from sqlalchemy import Table, Column, String, SmallInteger, BigInteger, \
+    Float, LargeBinary, MetaData, ForeignKey
+from migrate import *
+
+meta = MetaData()
+
+paper_table = Table('PaperTable', meta, Column('id', String, primary_key=True))
+
+paper_minhash = Table('paper_minhash', meta,
+    Column('paper_id', String, ForeignKey('PaperTable.id'), primary_key=True),
+    Column('signature', LargeBinary, nullable=False))
+
+lsh_bands = Table('lsh_bands', meta,
+    Column('band', SmallInteger, primary_key=True),
+    Column('bucket', BigInteger, primary_key=True),
+    Column('paper_id', String, primary_key=True))
+
+paper_duplicates = Table('paper_duplicates', meta,
+    Column('paper_id', String, ForeignKey('PaperTable.id'), primary_key=True),
+    Column('duplicate_id', String, ForeignKey('PaperTable.id'),
+           primary_key=True),
+    Column('similarity', Float, nullable=False))
+
+
+def upgrade(migrate_engine):
+    # Filled by running duplicates.py once over the existing corpus
+    meta.bind = migrate_engine
+    paper_minhash.create()
+    lsh_bands.create()
+    paper_duplicates.create()
+    migrate_engine.execute('CREATE INDEX ix_lsh_bands_paper_id '
+                           'ON lsh_bands (paper_id)')
+    migrate_engine.execute('CREATE INDEX ix_paper_duplicates_duplicate_id '
+                           'ON paper_duplicates (duplicate_id)')
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_duplicates.drop()
+    lsh_bands.drop()
+    paper_minhash.drop()
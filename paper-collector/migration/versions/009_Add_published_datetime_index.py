@@ -0,0 +1,11 @@
+from migrate import *
+
+
+def upgrade(migrate_engine):
+    # Lets the Parquet snapshot read back one published month at a time
+    migrate_engine.execute('CREATE INDEX ix_papertable_published_datetime '
+                           'ON "PaperTable" (published_datetime)')
+
+
+def downgrade(migrate_engine):
+    migrate_engine.execute('DROP INDEX ix_papertable_published_datetime')
@@ -0,0 +1,28 @@
+from sqlalchemy import Table, Column, Integer, SmallInteger, String, \
+    DateTime, LargeBinary, MetaData
+from migrate import *
+
+meta = MetaData()
+
+paper_versions = Table('paper_versions', meta,
+    Column('paper_id', String, primary_key=True),
+    Column('version', Integer, primary_key=True),
+    Column('title', String),
+    Column('arxiv_comment', String),
+    Column('updated_datetime', DateTime),
+    Column('base_version', Integer),
+    Column('chain', SmallInteger, nullable=False),
+    Column('summary_data', LargeBinary, nullable=False),
+    Column('summary_length', Integer, nullable=False))
+
+
+def upgrade(migrate_engine):
+    # Starts empty: the stored version of a paper becomes its first
+    # keyframe when ingest next sees a newer one
+    meta.bind = migrate_engine
+    paper_versions.create()
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_versions.drop()
@@ -0,0 +1,36 @@
+from sqlalchemy import Table, Column, Integer, String, DateTime, JSON, \
+    MetaData, ForeignKey
+from migrate import *
+
+meta = MetaData()
+
+paper_table = Table('PaperTable', meta, Column('id', String, primary_key=True))
+
+subscriptions = Table('subscriptions', meta,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False, unique=True),
+    Column('phrases', JSON, nullable=False),
+    Column('categories', JSON, nullable=False),
+    Column('created_at', DateTime))
+
+paper_subscriptions = Table('paper_subscriptions', meta,
+    Column('paper_id', String, ForeignKey('PaperTable.id'), primary_key=True),
+    Column('subscription_id', Integer, ForeignKey('subscriptions.id'),
+           primary_key=True))
+
+
+def upgrade(migrate_engine):
+    # The collector's original topic is added on its first run, and its
+    # existing papers are tagged by running subscriptions.py
+    meta.bind = migrate_engine
+    subscriptions.create()
+    paper_subscriptions.create()
+    migrate_engine.execute(
+        'CREATE INDEX ix_paper_subscriptions_subscription_id '
+        'ON paper_subscriptions (subscription_id)')
+
+
+def downgrade(migrate_engine):
+    meta.bind = migrate_engine
+    paper_subscriptions.drop()
+    subscriptions.drop()